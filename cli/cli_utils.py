@@ -1,13 +1,20 @@
+import asyncio
+import hashlib
 import importlib
 import json
+import multiprocessing
 import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
 
 import pandas as pd
 from rich.console import Console
 from tortoise import Tortoise
 from tortoise.exceptions import DoesNotExist
 
+from models.core import DatasetFile, ImportCheckpoint
 from models.geo import (
     Address,
     AdministrativeLevelOne,
@@ -22,6 +29,20 @@ from models.geo import (
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 from config import Settings
+from utils.db import (
+    add_missing_columns,
+    clear_kept,
+    copy_kept,
+    copy_merge,
+    create_kept_table,
+    index_exists,
+    prune_missing,
+)
+from utils.pagination import invalidate_count
+from utils.reference import reference_data
+from utils.regions import bounds, parse_polygons
+from utils.simplify import TopologySimplifier
+from utils.tiles import bump_tiles_version
 
 settings = Settings()
 console = Console()
@@ -60,9 +81,15 @@ async def load_fixture(app: str, model: str, env: str = "prod") -> None:
 
             await model_class.update_or_create(**item)
 
+    if model_class in reference_data.models:
+        await reference_data.invalidate(model_class)
+
     await Tortoise.close_connections()
 
 
+CITY_COPY_COLUMNS = ("name", "code_postal", "code_insee", "administrative_level_one_id", "administrative_level_two_id")
+
+
 async def load_administrative_levels():
     # TODO:
     # Source URL l2: https://www.data.gouv.fr/fr/datasets/departements-de-france/
@@ -70,25 +97,22 @@ async def load_administrative_levels():
     raise NotImplementedError("Loading administrative levels is not implemented yet.")
 
 
-async def load_cities():
-    """Load cities from a CSV file into the database."""
+async def load_cities() -> bool:
+    """Load cities from a CSV file into the database, returning whether any were loaded."""
     # Source URL: https://www.data.gouv.fr/fr/datasets/communes-france-1/
     csv_path = settings.csv_path / "france" / "cities" / "communes-france-2025.csv"
 
     # --- 1. Pre-load Administrative Level Data ---
     console.print("[cyan]Loading administrative levels into memory...[/cyan]")
     try:
-        level_one_db = await AdministrativeLevelOne.all()
-        level_one_map = {str(lvl.code_insee): lvl for lvl in level_one_db}
-
-        level_two_db = await AdministrativeLevelTwo.all()
-        level_two_map = {str(lvl.code): lvl for lvl in level_two_db}
+        level_one_map = pd.Series({str(code_insee): code for code_insee, code in await AdministrativeLevelOne.all().values_list("code_insee", "code")}, dtype=object)
+        level_two_map = pd.Series({str(code): code for code in await AdministrativeLevelTwo.all().values_list("code", flat=True)}, dtype=object)
 
         console.print(f"[green]Loaded {len(level_one_map)} administrative level one entries.[/green]")
         console.print(f"[green]Loaded {len(level_two_map)} administrative level two entries.[/green]")
     except Exception as e:
         console.print(f"[red]Error loading administrative levels: {e}. Aborting city loading.[/red]")
-        return
+        return False
 
     # --- 2. Read and Prepare City Data from CSV ---
     console.print(f"[cyan]Reading city data from: {csv_path}...[/cyan]")
@@ -112,7 +136,7 @@ async def load_cities():
         missing_cols = [col for col in required_csv_cols if col not in df.columns]
         if missing_cols:
             console.print(f"[red]Error: CSV file {csv_path.name} is missing required columns: {', '.join(missing_cols)}.[/red]")
-            return
+            return False
         df = df[required_csv_cols]
 
         df.dropna(subset=["code_insee", "name", "code_postal"], inplace=True)
@@ -126,54 +150,48 @@ async def load_cities():
 
     except FileNotFoundError:
         console.print(f"[red]Error: Cities CSV file not found at {csv_path}.[/red]")
-        return
+        return False
     except Exception as e:
         console.print(f"[red]Error reading or parsing cities CSV {csv_path.name}: {e}[/red]")
-        return
+        return False
 
     if df.empty:
         console.print(f"[yellow]No valid city data found in {csv_path.name} after cleaning and deduplication.[/yellow]")
-        return
+        return False
 
-    city_objects_to_create = []
-    for row_dict in df.to_dict(orient="records"):
-        lvl1_code_from_csv = row_dict["admin_level_one_csv_code"]
-        lvl2_code_from_csv = row_dict["admin_level_two_csv_code"]
-
-        level_one_instance = level_one_map.get(lvl1_code_from_csv)
-        level_two_instance = level_two_map.get(lvl2_code_from_csv)
-
-        if not level_one_instance and not level_two_instance:
-            # console.print(f"[yellow]Skipping city '{row_dict['name']}' (INSEE: {row_dict['code_insee']}) due to missing both admin levels.[/yellow]")
-            continue
-        # if not level_one_instance or not level_two_instance:
-        #     console.print(f"[yellow]Skipping city '{row_dict['name']}' (INSEE: {row_dict['code_insee']}) due to one or more missing admin levels.[/yellow]")
-        #     continue
-
-        city_obj_data = {
-            "name": row_dict["name"],
-            "code_postal": row_dict["code_postal"],
-            "code_insee": row_dict["code_insee"],
-            "administrative_level_one": level_one_instance,
-            "administrative_level_two": level_two_instance,
-        }
-        city_objects_to_create.append(City(**city_obj_data))
-
-    if not city_objects_to_create:
+    # --- 3. Resolve Administrative Levels ---
+    df["administrative_level_one_id"] = df["admin_level_one_csv_code"].map(level_one_map)
+    df["administrative_level_two_id"] = df["admin_level_two_csv_code"].map(level_two_map)
+    df = df[df["administrative_level_one_id"].notna() | df["administrative_level_two_id"].notna()]
+    if df.empty:
         console.print("[yellow]No city objects to create after processing CSV data and admin level mapping.[/yellow]")
-        return
+        return False
+
+    city_records = list(
+        zip(
+            df["name"].tolist(),
+            df["code_postal"].tolist(),
+            df["code_insee"].tolist(),
+            df["administrative_level_one_id"].where(df["administrative_level_one_id"].notna(), None).tolist(),
+            df["administrative_level_two_id"].where(df["administrative_level_two_id"].notna(), None).tolist(),
+        )
+    )
 
-    # --- 3. Bulk Create Cities in Database ---
-    console.print(f"[cyan]Attempting to bulk create {len(city_objects_to_create)} cities...[/cyan]")
+    # --- 4. Bulk Create Cities in Database ---
+    console.print(f"[cyan]Attempting to bulk create {len(city_records)} cities...[/cyan]")
     try:
-        await City.bulk_create(city_objects_to_create, ignore_conflicts=True)
-        console.print(f"[green]Cities bulk processing complete. {len(city_objects_to_create)} candidates processed.[/green]")
+        await copy_merge(City, CITY_COPY_COLUMNS, city_records, conflict_columns=("name", "administrative_level_one_id", "administrative_level_two_id"))
+        await invalidate_count(City)
+        console.print(f"[green]Cities bulk processing complete. {len(city_records)} candidates processed.[/green]")
     except Exception as e:
         console.print(f"[red]Error during bulk city creation: {e}[/red]")
+        return False
+
+    return True
 
 
-async def load_cities_data():
-    """Load cities data from a CSV file into the database."""
+async def load_cities_data() -> bool:
+    """Load cities data from a CSV file into the database, returning whether any was loaded."""
     # Source URL: https://www.insee.fr/fr/statistiques/5020062?sommaire=5040030
     # The link above only provides salary for a few cities, not all.
     # It was cleaned and converted to CSV format, data was added.
@@ -195,7 +213,7 @@ async def load_cities_data():
 
         if missing_cols:
             console.print(f"[red]Error: CSV file {csv_path.name} is missing required columns: {', '.join(missing_cols)}.[/red]")
-            return
+            return False
 
         df = df[required_csv_cols]
         df.dropna(subset=["code_postal", "salary", "p21_pop"], inplace=True)
@@ -208,15 +226,15 @@ async def load_cities_data():
 
     except FileNotFoundError:
         console.print(f"[red]Error: Cities CSV file not found at {csv_path}.[/red]")
-        return
+        return False
 
     except Exception as e:
         console.print(f"[red]Error reading or parsing cities CSV {csv_path.name}: {e}[/red]")
-        return
+        return False
 
     if df.empty:
         console.print(f"[yellow]No valid city data found in {csv_path.name} after cleaning and deduplication.[/yellow]")
-        return
+        return False
 
     city_data_objects_to_create = []
     for row_dict in df.to_dict(orient="records"):
@@ -247,7 +265,7 @@ async def load_cities_data():
 
     if not city_data_objects_to_create:
         console.print("[yellow]No city data objects to create after processing CSV data and city instance mapping.[/yellow]")
-        return
+        return False
     # --- 3. Bulk Create City Data in Database ---
     console.print(f"[cyan]Attempting to bulk create {len(city_data_objects_to_create)} city data objects...[/cyan]")
     try:
@@ -257,10 +275,13 @@ async def load_cities_data():
     except Exception as e:
         console.print(f"[red]Error during bulk city data creation: {e}[/red]")
         console.print("[yellow]Some city data may not have been created. Consider retrying or individual processing for failed items.[/yellow]")
+        return False
 
+    return True
 
-async def load_street_types():
-    """Load street types from a CSV file into the database."""
+
+async def load_street_types() -> bool:
+    """Load street types from a CSV file into the database, returning whether any were loaded."""
     # Source URL: https://www.data.gouv.fr/fr/datasets/finess-types-de-voies/
     csv_path = settings.csv_path / "france" / "streets" / "types" / "interhop-adresses-types-voies.csv"
 
@@ -273,7 +294,7 @@ async def load_street_types():
         missing_cols = [col for col in required_cols if col not in df.columns]
         if missing_cols:
             console.print(f"[red]Error: CSV file {csv_path.name} is missing required columns: {', '.join(missing_cols)}.[/red]")
-            return
+            return False
 
         df = df[required_cols]
         df.dropna(subset=required_cols, inplace=True)
@@ -287,20 +308,20 @@ async def load_street_types():
 
     except FileNotFoundError:
         console.print(f"[red]Error: Street types CSV file not found at {csv_path}.[/red]")
-        return
+        return False
     except Exception as e:
         console.print(f"[red]Error reading or parsing street types CSV {csv_path.name}: {e}[/red]")
-        return
+        return False
 
     if df.empty:
         console.print(f"[yellow]No valid street types found in {csv_path.name} after cleaning.[/yellow]")
-        return
+        return False
 
     street_type_objects_to_create = [StreetType(code=row["code"], name=row["label"]) for _, row in df.iterrows()]
 
     if not street_type_objects_to_create:
         console.print("[yellow]No street type objects to create after processing CSV data.[/yellow]")
-        return
+        return False
 
     # --- 2. Bulk Create Street Types in Database ---
     console.print(f"[cyan]Attempting to bulk create {len(street_type_objects_to_create)} street types...[/cyan]")
@@ -309,10 +330,302 @@ async def load_street_types():
         console.print(f"[green]Street types bulk processing complete. {len(street_type_objects_to_create)} candidates processed.[/green]")
     except Exception as e:
         console.print(f"[red]Error during bulk street type creation: {e}[/red]")
+        return False
+
+    return True
+
+
+ADDRESS_CSV_COLUMNS = ["nom_afnor", "code_postal", "numero", "rep", "code_insee", "lon", "lat"]
+ADDRESS_COPY_COLUMNS = ("street_id", "number", "number_extension", "latitude", "longitude", "source")
+ADDRESS_KEY_COLUMNS = ("street_id", "number", "number_extension")
+STREET_COPY_COLUMNS = ("name", "street_type_id", "city_id")
+
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
 
 
-async def load_streets():
-    """Load streets from CSV files into the database."""
+def _manifest_path(csv_path: Path) -> str:
+    return str(csv_path.relative_to(settings.csv_path))
+
+
+async def changed_files(stage: str, csv_files: List[Path], force: bool = False) -> List[Path]:
+    """
+    The files of a stage that changed since they were last loaded, according to the load manifest.
+
+    A file is unchanged when its size and mtime match its manifest entry. When only the mtime moved, its
+    content hash decides, and the entry gets the new mtime so the next run skips the hashing.
+    """
+    if force:
+        return csv_files
+
+    manifest = {entry.path: entry for entry in await DatasetFile.filter(stage=stage)}
+    changed = []
+    for csv_path in csv_files:
+        entry = manifest.get(_manifest_path(csv_path))
+        stat = csv_path.stat()
+        if entry and entry.size == stat.st_size:
+            if entry.mtime == stat.st_mtime:
+                continue
+            if entry.sha256 == await asyncio.to_thread(file_sha256, csv_path):
+                entry.mtime = stat.st_mtime
+                await entry.save(update_fields=["mtime"])
+                continue
+        changed.append(csv_path)
+
+    return changed
+
+
+async def record_file(stage: str, csv_path: Path, rows: int):
+    """Record a file of a stage as loaded, with its fingerprint and the number of records it produced."""
+    stat = csv_path.stat()
+    await DatasetFile.update_or_create(
+        defaults={"size": stat.st_size, "mtime": stat.st_mtime, "sha256": await asyncio.to_thread(file_sha256, csv_path), "rows": rows},
+        stage=stage,
+        path=_manifest_path(csv_path),
+    )
+
+
+async def load_checkpoints(stage: str) -> Dict[str, ImportCheckpoint]:
+    """The checkpoints of a stage by file, the stage itself under the empty path."""
+    return {checkpoint.path: checkpoint for checkpoint in await ImportCheckpoint.filter(stage=stage)}
+
+
+async def save_checkpoint(stage: str, csv_path: Optional[Path] = None, chunk: int = -1, done: bool = False):
+    """Record the last chunk of a file committed by a stage, or the file or stage as done."""
+    await ImportCheckpoint.update_or_create(defaults={"chunk": chunk, "done": done}, stage=stage, path=_manifest_path(csv_path) if csv_path else "")
+
+
+async def clear_checkpoints():
+    """Forget the progress of the previous imports, for a run starting over."""
+    await ImportCheckpoint.all().delete()
+
+
+async def run_stage(stage: str, load: Callable[[], Awaitable[bool]], resume: bool = False):
+    """
+    Run the loader of a stage loaded as a whole, skipped when `resume`d after it completed.
+
+    The loader returns whether it succeeded, only then is the stage checkpointed as done: a stage that
+    failed or loaded nothing runs again on resume.
+    """
+    checkpoint = (await load_checkpoints(stage)).get("") if resume else None
+    if checkpoint and checkpoint.done:
+        console.print(f"[cyan]Stage {stage} already loaded, skipped.[/cyan]")
+        return
+
+    if await load():
+        await save_checkpoint(stage, done=True)
+    else:
+        console.print(f"[yellow]Stage {stage} did not complete, it will run again on resume.[/yellow]")
+
+
+async def resume_progress(stage: str, csv_files: List[Path]) -> Tuple[List[Path], Dict[Path, int]]:
+    """
+    The files of a stage left to load and the first chunk to write of each.
+
+    Done files are left out, the others restart after their last committed chunk. Chunk indexes are only
+    meaningful for an unchanged chunk size.
+    """
+    checkpoints = await load_checkpoints(stage)
+    remaining, resume_from = [], {}
+    for csv_path in csv_files:
+        checkpoint = checkpoints.get(_manifest_path(csv_path))
+        if checkpoint and checkpoint.done:
+            continue
+        remaining.append(csv_path)
+        if checkpoint:
+            resume_from[csv_path] = checkpoint.chunk + 1
+
+    return remaining, resume_from
+
+
+# Lookup tables of the parsing processes, set once per process by `_init_worker`, and the queue they send
+# their chunks through.
+_worker_state: Dict[str, Any] = {}
+
+
+def _init_worker(state: Dict[str, Any]):
+    _worker_state.clear()
+    _worker_state.update(state)
+
+
+def _parse_file(iter_chunks: Callable[[Path], Iterator[List[tuple]]], csv_path: Path):
+    """
+    Parse a file in a pool process, sending its chunks to the parent one at a time: `put` blocks while the
+    queue is full, so the process never runs more than a chunk ahead of it. An error is sent as its
+    message, and the file always ends with None.
+    """
+    chunks = _worker_state["chunks"]
+    try:
+        for records in iter_chunks(csv_path):
+            chunks.put((csv_path, records))
+    except Exception as e:
+        chunks.put((csv_path, f"{e}"))
+    finally:
+        chunks.put((csv_path, None))
+
+
+async def _load_sequentially(
+    csv_files: List[Path],
+    iter_chunks: Callable[[Path], Iterator[List[tuple]]],
+    write: Callable[[Path, int, List[tuple]], Awaitable[None]],
+    finish: Optional[Callable[[Path], Awaitable[None]]],
+):
+    for csv_path in csv_files:
+        console.print(f"[cyan]Processing file: {csv_path.name}...[/cyan]")
+        try:
+            for index, records in enumerate(iter_chunks(csv_path)):
+                await write(csv_path, index, records)
+            if finish:
+                await finish(csv_path)
+        except Exception as e:
+            console.print(f"[red]Error while loading {csv_path.name}: {e}[/red]")
+
+
+async def _write_chunks(
+    csv_path: Path,
+    chunks: asyncio.Queue,
+    write: Callable[[Path, int, List[tuple]], Awaitable[None]],
+    finish: Optional[Callable[[Path], Awaitable[None]]],
+    writing: asyncio.Semaphore,
+):
+    """
+    Write the chunks of a file in order as they are parsed, then finish it. After an error the remaining
+    chunks are still drained, so that the process parsing the file is not left blocked.
+    """
+    index, error = 0, None
+    while (records := await chunks.get()) is not None:
+        if error is not None:
+            continue
+        if isinstance(records, str):
+            error = records
+            continue
+        try:
+            async with writing:
+                await write(csv_path, index, records)
+        except Exception as e:
+            error = f"{e}"
+        index += 1
+
+    if error is None and finish:
+        try:
+            await finish(csv_path)
+        except Exception as e:
+            error = f"{e}"
+    if error is not None:
+        console.print(f"[red]Error while loading {csv_path.name}: {error}[/red]")
+
+
+async def _dispatch_chunks(chunks: multiprocessing.Queue, files: Dict[Path, asyncio.Queue]):
+    """Route the chunks sent by the pool processes to the queue of their file, until None."""
+    loop = asyncio.get_running_loop()
+    while (item := await loop.run_in_executor(None, chunks.get)) is not None:
+        csv_path, records = item
+        if csv_path in files:
+            await files[csv_path].put(records)
+
+
+async def _load_in_pool(
+    csv_files: List[Path],
+    iter_chunks: Callable[[Path], Iterator[List[tuple]]],
+    write: Callable[[Path, int, List[tuple]], Awaitable[None]],
+    state: Dict[str, Any],
+    workers: int,
+    finish: Optional[Callable[[Path], Awaitable[None]]],
+):
+    loop = asyncio.get_running_loop()
+    chunks = multiprocessing.Queue(maxsize=workers)
+    files: Dict[Path, asyncio.Queue] = {}
+    slots, writing = asyncio.Semaphore(workers), asyncio.Semaphore(settings.dataset_max_writers)
+
+    async def parse(pool: ProcessPoolExecutor, csv_path: Path):
+        try:
+            await loop.run_in_executor(pool, _parse_file, iter_chunks, csv_path)
+        except Exception as e:
+            # The process died before it could end the file.
+            await files[csv_path].put(f"{e}")
+            await files[csv_path].put(None)
+
+    async def load(pool: ProcessPoolExecutor, csv_path: Path):
+        # The slot is held until the file is written, which bounds the files in flight.
+        async with slots:
+            files[csv_path] = asyncio.Queue(maxsize=2)
+            await asyncio.gather(parse(pool, csv_path), _write_chunks(csv_path, files[csv_path], write, finish, writing))
+            del files[csv_path]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=({**state, "chunks": chunks},)) as pool:
+        dispatcher = asyncio.create_task(_dispatch_chunks(chunks, files))
+        await asyncio.gather(*(load(pool, csv_path) for csv_path in csv_files))
+        chunks.put(None)
+        await dispatcher
+
+
+async def run_file_pipeline(
+    csv_files: List[Path],
+    iter_chunks: Callable[[Path], Iterator[List[tuple]]],
+    write: Callable[[Path, int, List[tuple]], Awaitable[None]],
+    state: Dict[str, Any],
+    workers: int = 1,
+    finish: Optional[Callable[[Path], Awaitable[None]]] = None,
+):
+    """
+    Parse files into chunks of records and hand each chunk to `write`, then each file to `finish`.
+
+    With one worker, files are parsed in-process one chunk at a time. With more, `workers` files are
+    parsed at once in a process pool whose processes receive `state` once. Their chunks are streamed back
+    one at a time through a bounded queue and written in order per file, by at most
+    `dataset_max_writers` concurrent writes. Parsing never runs more than a few chunks ahead of the
+    database, so memory stays bounded by the number of workers whatever the size of the files.
+
+    Args:
+        csv_files (List[Path]): The files to load.
+        iter_chunks (Callable): Top-level function yielding the record chunks of a file from `_worker_state`.
+        write (Callable): Coroutine writing a chunk, called with the file, the chunk index and the records.
+        state (Dict[str, Any]): The lookup tables `iter_chunks` reads.
+        workers (int): The number of parsing processes.
+        finish (Callable): Coroutine called with each file once all its chunks are written.
+    """
+    _init_worker(state)
+    if workers <= 1:
+        await _load_sequentially(csv_files, iter_chunks, write, finish)
+    else:
+        await _load_in_pool(csv_files, iter_chunks, write, state, workers, finish)
+
+
+def iter_street_chunks(csv_path: Path) -> Iterator[List[tuple]]:
+    """Yield the street records of a department file, as a single chunk."""
+    df = pd.read_csv(csv_path, sep=";", encoding="utf-8", dtype={"CODE_POSTAL": str})
+    df = df.rename(columns={"DEP": "administrative_level_two", "CODECOM": "code_com", "CODEVOIE": "code_path", "LIBVOIE": "name", "LIBCOM": "name_city"})
+
+    # Ensure essential columns are present
+    missing_cols = [col for col in ("name", "CODE_POSTAL") if col not in df.columns]
+    if missing_cols:
+        raise ValueError(f"missing required columns: {', '.join(missing_cols)}")
+
+    df = df[["name", "CODE_POSTAL"]].dropna(subset=["name"])
+    df["name"] = df["name"].astype(str).str.strip()
+    df["city_id"] = df["CODE_POSTAL"].map(_worker_state["cities_map_by_postal_code"])
+    # Avoid adding exact duplicate streets to the batch
+    df = df[(df["name"] != "") & df["city_id"].notna()].drop_duplicates(subset=["name", "city_id"])
+
+    # --- Street Type Logic Placeholder ---
+    street_records = list(zip(df["name"].tolist(), repeat(_worker_state["default_street_type_id"]), df["city_id"].astype("int64").tolist()))
+
+    yield street_records
+
+
+async def load_streets(workers: int = 1, force: bool = False, resume: bool = False):
+    """
+    Load streets from CSV files into the database, parsing `workers` files in parallel.
+
+    Files unchanged since their last load are skipped, unless `force`d, and so are the files already
+    done by the import being `resume`d. Streets are only ever added: addresses of another dataset point
+    to them.
+    """
     # Source URL: https://www.lesruesdefrance.com/liste_rue_par_dep_csv.php?p=tele
     csv_paths_root = settings.csv_path / "france" / "streets"
     all_csv_files = list(csv_paths_root.glob("*.csv"))
@@ -321,11 +634,17 @@ async def load_streets():
         console.print("[yellow]No CSV files found to process.[/yellow]")
         return
 
+    csv_files = await changed_files("streets", all_csv_files, force)
+    if resume:
+        csv_files, _ = await resume_progress("streets", csv_files)
+    console.print(f"[cyan]{len(all_csv_files) - len(csv_files)} unchanged or already loaded street files skipped.[/cyan]")
+    if not csv_files:
+        return
+
     # --- 1. Pre-load data ---
     console.print("[cyan]Loading all cities into memory...[/cyan]")
     try:
-        all_cities_db = await City.all()
-        cities_map_by_postal_code = {city.code_postal: city for city in all_cities_db}
+        cities_map_by_postal_code = pd.Series(dict(await City.all().values_list("code_postal", "id")), dtype="Int64")
         console.print(f"[green]Loaded {len(cities_map_by_postal_code)} cities.[/green]")
     except Exception as e:
         console.print(f"[red]Error loading cities: {e}. Aborting street loading.[/red]")
@@ -337,83 +656,155 @@ async def load_streets():
     if not default_street_type_instance:
         console.print("[yellow]Warning: Default street type 'ABE' not found. Street type might be null.[/yellow]")
 
-    all_street_objects_to_create = []
-    processed_identifiers = set()  # Avoid adding exact duplicate Street objects to the batch
-
-    for csv_path in all_csv_files:
-        console.print(f"[cyan]Processing file: {csv_path.name}...[/cyan]")
-        try:
-            df = pd.read_csv(
-                csv_path,
-                sep=";",
-                encoding="utf-8",
-                dtype={"CODE_POSTAL": str},
+    # --- 2. Parse, map and merge file by file ---
+    totals = {"created": 0}
+    rows: Dict[Path, int] = {}
+
+    async def write(csv_path: Path, index: int, street_records: List[tuple]):
+        file_created = await copy_merge(Street, STREET_COPY_COLUMNS, street_records, conflict_columns=("name", "street_type_id", "city_id"))
+        totals["created"] += file_created
+        rows[csv_path] = rows.get(csv_path, 0) + len(street_records)
+        console.print(f"[blue]Created {file_created} of {len(street_records)} streets from {csv_path.name}. Total: {totals['created']}[/blue]")
+
+    async def finish(csv_path: Path):
+        await record_file("streets", csv_path, rows.pop(csv_path, 0))
+        await save_checkpoint("streets", csv_path, done=True)
+
+    state = {
+        "cities_map_by_postal_code": cities_map_by_postal_code,
+        "default_street_type_id": default_street_type_instance.code if default_street_type_instance else None,
+    }
+    await run_file_pipeline(csv_files, iter_street_chunks, write, state, workers=workers, finish=finish)
+    console.print(f"[green]Street bulk processing completed. {totals['created']} streets created.[/green]")
+
+
+async def migrate_address_key(dedupe: bool = False) -> bool:
+    """
+    Give an existing address table the source column and unique key the address loader merges on.
+
+    `generate_schemas` only creates missing tables, so databases created before `Address` had its
+    `source` lack the column and its index, which are added, and those created before its
+    `unique_together` lack the constraint `ON CONFLICT (street_id, number, number_extension)` needs.
+    Missing repetition indexes are backfilled to "" first, NULLs never conflicting. Duplicated keys
+    block the index: with `dedupe` the lowest id of each is kept and the rows pointing to the others are
+    moved to it, otherwise nothing is changed.
+
+    Returns:
+        bool: Whether the unique key is in place.
+    """
+    table = Address._meta.db_table
+    key = ", ".join(ADDRESS_KEY_COLUMNS)
+    references = [
+        (model._meta.db_table, model._meta.fields_map[name].source_field)
+        for model in Tortoise.apps["models"].values()
+        for name in model._meta.fk_fields
+        if model._meta.fields_map[name].related_model is Address
+    ]
+
+    client = Tortoise.get_connection("default")
+    async with client.acquire_connection() as connection:
+        if await add_missing_columns(connection, table, {"source": "VARCHAR(64)"}):
+            console.print("[cyan]Added the address source column.[/cyan]")
+        if not await index_exists(connection, table, ("source",)):
+            await connection.execute(f"CREATE INDEX idx_{table}_source ON {table} (source)")
+
+        if await index_exists(connection, table, ADDRESS_KEY_COLUMNS, unique=True):
+            return True
+
+        async with connection.transaction():
+            backfilled = await connection.execute(f"UPDATE {table} SET number_extension = '' WHERE number_extension IS NULL")
+            console.print(f"[cyan]Backfilled {backfilled.rsplit(' ', 1)[-1]} missing repetition indexes.[/cyan]")
+
+            await connection.execute(
+                f"CREATE TEMP TABLE duplicate_{table} ON COMMIT DROP AS SELECT id, keep_id FROM ("
+                f"SELECT id, min(id) OVER (PARTITION BY {key}) AS keep_id FROM {table}) keys WHERE id <> keep_id"
             )
-        except Exception as e:
-            console.print(f"[red]Error reading or parsing CSV {csv_path.name}: {e}[/red]")
-            continue
-
-        df = df.rename(columns={"DEP": "administrative_level_two", "CODECOM": "code_com", "CODEVOIE": "code_path", "LIBVOIE": "name", "LIBCOM": "name_city"})
+            duplicates = await connection.fetchval(f"SELECT count(*) FROM duplicate_{table}")
+            if duplicates and not dedupe:
+                console.print(f"[red]{duplicates} addresses duplicate the key ({key}), rerun with --dedupe to merge them.[/red]")
+                return False
+
+            if duplicates:
+                for referencing_table, column in references:
+                    await connection.execute(f"UPDATE {referencing_table} SET {column} = d.keep_id FROM duplicate_{table} d WHERE {referencing_table}.{column} = d.id")
+                await connection.execute(f"DELETE FROM {table} USING duplicate_{table} d WHERE {table}.id = d.id")
+                console.print(f"[cyan]Merged {duplicates} duplicated addresses.[/cyan]")
+
+            await connection.execute(f"CREATE UNIQUE INDEX uid_{table}_street_number ON {table} ({key})")
+
+    console.print("[green]Address unique key created.[/green]")
+    return True
+
+
+def map_address_chunk(chunk: pd.DataFrame, streets_by_name: pd.Series, source: str) -> List[tuple]:
+    """Map a chunk of BAN rows of the `source` file to address records, skipping rows without a known street or number."""
+    chunk = chunk.dropna(subset=["nom_afnor", "code_postal", "numero"])
+    chunk = chunk.assign(street_id=chunk["nom_afnor"].astype(str).str.strip().map(streets_by_name))
+    chunk = chunk[chunk["street_id"].notna() & (chunk["code_postal"] != "")]
+
+    rep = chunk["rep"] if "rep" in chunk else pd.Series(None, index=chunk.index, dtype=object)
+    chunk = chunk.assign(number_extension=rep.fillna("").astype(str).str.strip().str.lower())
+    # Avoid adding exact duplicate addresses to the batch
+    chunk = chunk.drop_duplicates(subset=["street_id", "numero", "number_extension"])
+
+    def coordinates(column: str) -> List[Any]:
+        values = pd.to_numeric(chunk[column], errors="coerce") if column in chunk else pd.Series(float("nan"), index=chunk.index)
+        return values.astype(object).where(values.notna(), None).tolist()
+
+    return list(
+        zip(
+            chunk["street_id"].astype("int64").tolist(),
+            chunk["numero"].tolist(),
+            chunk["number_extension"].tolist(),
+            coordinates("lat"),
+            coordinates("lon"),
+            repeat(source),
+        )
+    )
 
-        required_pandas_cols = ["name", "CODE_POSTAL"]
-        optional_pandas_cols = ["code_path", "administrative_level_two", "code_com", "name_city"]
 
-        # Ensure essential columns are present
-        missing_cols = [col for col in required_pandas_cols if col not in df.columns]
-        if missing_cols:
-            console.print(f"[red]Skipping {csv_path.name}, missing required columns: {', '.join(missing_cols)}.[/red]")
+def iter_address_chunks(csv_path: Path) -> Iterator[List[tuple]]:
+    """Yield the address records of a BAN file, `chunksize` rows of the file at a time."""
+    reader = pd.read_csv(
+        csv_path,
+        sep=";",
+        encoding="utf-8",
+        dtype={"code_postal": str, "code_insee": str, "numero": str, "rep": str},
+        usecols=lambda col: col in ADDRESS_CSV_COLUMNS,
+        chunksize=_worker_state["chunksize"],
+        compression="gzip",
+    )
+    resume_from = _worker_state.get("resume_from", {}).get(csv_path, 0)
+    for index, chunk in enumerate(reader):
+        if index < resume_from:
+            # Merged and its keys collected before the import was interrupted.
+            yield []
             continue
 
-        for row_dict in df.to_dict(orient="records"):
-            postal_code = row_dict.get("CODE_POSTAL")
-            street_name = row_dict.get("name")
-
-            if not street_name or pd.isna(street_name):
-                # console.print(f"[yellow]Skipping row due to empty street name in {csv_path.name}.[/yellow]")
-                continue
-            street_name = str(street_name).strip()
-
-            city_instance = cities_map_by_postal_code.get(postal_code)
-            if not city_instance:
-                # console.print(f"[yellow]Skipping street '{street_name}' (Postal: {postal_code}) due to missing city. File: {csv_path.name}[/yellow]")
-                continue
-
-            # --- Street Type Logic Placeholder ---
-            current_street_type = default_street_type_instance
-
-            street_identifier = (street_name, city_instance.id)
-            if street_identifier in processed_identifiers:
-                continue
-            processed_identifiers.add(street_identifier)
-
-            street_obj_data = {
-                "name": street_name,
-                "street_type": current_street_type,
-                "city": city_instance,
-            }
-            all_street_objects_to_create.append(Street(**street_obj_data))
+        missing_cols = [col for col in ("nom_afnor", "code_postal", "numero") if col not in chunk.columns]
+        if missing_cols:
+            raise ValueError(f"missing required columns: {', '.join(missing_cols)}")
 
-        console.print(f"[blue]Collected {len(df)} potential streets from {csv_path.name}. Total candidates: {len(all_street_objects_to_create)}[/blue]")
+        yield map_address_chunk(chunk, _worker_state["streets_by_name"], csv_path.name)
 
-    if not all_street_objects_to_create:
-        console.print("[yellow]No valid street data collected from CSV files to create.[/yellow]")
-        return
 
-    # --- 3. Bulk create streets ---
-    console.print(f"[cyan]Attempting to bulk create/update {len(all_street_objects_to_create)} streets...[/cyan]")
-    try:
-        await Street.bulk_create(all_street_objects_to_create, ignore_conflicts=True)
-        # Note: `ignore_conflicts=True` doesn't usually return which objects were created vs. ignored.
-        console.print(f"[green]Street bulk processing completed. {len(all_street_objects_to_create)} candidates processed.[/green]")
-        # TODO: Add logic to check which streets were actually created vs. ignored.
+async def load_addresses(workers: int = 1, force: bool = False, resume: bool = False, chunksize: int = settings.dataset_chunk_size, batch_size: int = settings.dataset_batch_size):
+    """
+    Load addresses from CSV files into the database.
 
-    except Exception as e:
-        console.print(f"[red]Error during bulk street creation: {e}[/red]")
-        console.print("[yellow]Some streets may not have been created. Consider retrying or individual processing for failed items.[/yellow]")
+    Files are read `chunksize` rows at a time and each chunk is mapped and merged `batch_size` rows per
+    COPY. With one worker the next chunk is only read once the previous one is merged, so memory stays
+    flat whatever the size of the dataset; with more, `workers` files are parsed in parallel processes.
 
+    Files unchanged since their last load are skipped, unless `force`d. Changed files are loaded as a
+    delta: new addresses are inserted, moved ones updated, and the addresses the file no longer has are
+    deleted once it is fully loaded.
 
-async def load_addresses():
-    """Load addresses from CSV files into the database."""
+    The keys of each merged chunk are streamed into a kept table rather than held in memory, and the
+    pruning anti-joins against it. Each merged chunk is then checkpointed. A `resume`d import
+    skips the files it already loaded and, in the file it stopped in, maps and merges again only from the
+    chunk after the last committed one, the keys of the earlier ones being already collected.
+    """
     # todo Source URL:
     csv_paths_root = settings.csv_path / "france" / "addresses"
     all_csv_files = list(csv_paths_root.glob("*.csv.gz"))
@@ -422,138 +813,214 @@ async def load_addresses():
         console.print("[yellow]No address CSV files found to process.[/yellow]")
         return
 
+    csv_files = await changed_files("addresses", all_csv_files, force)
+    resume_from: Dict[Path, int] = {}
+    if resume:
+        csv_files, resume_from = await resume_progress("addresses", csv_files)
+    console.print(f"[cyan]{len(all_csv_files) - len(csv_files)} unchanged or already loaded address files skipped.[/cyan]")
+    if not csv_files:
+        return
+
+    if not await migrate_address_key():
+        console.print("[red]Addresses cannot be merged without their unique key. Aborting address loading.[/red]")
+        return
+
     # --- 1. Pre-load data ---
     console.print("[cyan]Loading all streets into memory...[/cyan]")
     try:
-        all_streets_db = await Street.all()
-        streets_map_by_name = {f"{street.name}": street for street in all_streets_db}
-        console.print(f"[green]Loaded {len(streets_map_by_name)} streets.[/green]")
+        streets_by_name = pd.Series(dict(await Street.all().values_list("name", "id")), dtype="Int64")
+        console.print(f"[green]Loaded {len(streets_by_name)} streets.[/green]")
     except Exception as e:
         console.print(f"[red]Error loading streets: {e}. Aborting address loading.[/red]")
         return
 
-    all_address_objects_to_create = []
-    processed_identifiers = set()  # Avoid adding exact duplicate Address objects to the batch
-    for csv_path in all_csv_files:
-        console.print(f"[cyan]Processing file: {csv_path.name}...[/cyan]")
-        try:
-            df = pd.read_csv(
-                csv_path,
-                sep=";",
-                encoding="utf-8",
-                dtype={"code_postal": str, "code_insee": str},
-                compression="gzip",
-            )
-        except Exception as e:
-            console.print(f"[red]Error reading or parsing CSV {csv_path.name}: {e}[/red]")
-            continue
-
-        # df = df.rename(columns={"code_postal": "code_postal", "code_insee": "insee_code", "voie": "street_name", "numero": "number"})
+    # --- 2. Parse, map and merge chunk by chunk ---
+    totals = {"merged": 0, "deleted": 0}
+    await create_kept_table(Address, ADDRESS_KEY_COLUMNS, "source")
 
-        required_pandas_cols = ["nom_afnor", "code_postal", "numero"]
-        optional_pandas_cols = ["code_insee", "x", "y"]
-
-        # Ensure essential columns are present
-        missing_cols = [col for col in required_pandas_cols if col not in df.columns]
-        if missing_cols:
-            console.print(f"[red]Skipping {csv_path.name}, missing required columns: {', '.join(missing_cols)}.[/red]")
-            continue
-
-        for row_dict in df.to_dict(orient="records"):
-            street_name = row_dict.get("nom_afnor")
-            code_postal = row_dict.get("code_postal")
-            number = row_dict.get("numero")
-            latitude = row_dict.get("x")
-            longitude = row_dict.get("y")
-
-            if not street_name or pd.isna(street_name):
-                # console.print(f"[yellow]Skipping row due to empty street name in {csv_path.name}.[/yellow]")
+    async def write(csv_path: Path, index: int, address_records: List[tuple]):
+        if index < resume_from.get(csv_path, 0):
+            return
+        if index == 0:
+            # Keys left by an earlier, interrupted load of the file that is not resumed.
+            await clear_kept(Address, "source", csv_path.name)
+
+        for start in range(0, len(address_records), batch_size):
+            totals["merged"] += await copy_merge(
+                Address,
+                ADDRESS_COPY_COLUMNS,
+                address_records[start : start + batch_size],
+                conflict_columns=ADDRESS_KEY_COLUMNS,
+                update_columns=("latitude", "longitude", "source"),
+            )
+        await copy_kept(Address, ADDRESS_KEY_COLUMNS, (record[:3] for record in address_records), "source", csv_path.name)
+        await save_checkpoint("addresses", csv_path, index)
+        console.print(f"[blue]Merged chunk {index} of {csv_path.name}. Total: {totals['merged']}[/blue]")
+
+    async def finish(csv_path: Path):
+        kept, deleted = await prune_missing(Address, ADDRESS_KEY_COLUMNS, "source", csv_path.name)
+        totals["deleted"] += deleted
+        await record_file("addresses", csv_path, kept)
+        await save_checkpoint("addresses", csv_path, done=True)
+        if deleted:
+            console.print(f"[blue]Deleted {deleted} addresses no longer in {csv_path.name}.[/blue]")
+
+    state = {"streets_by_name": streets_by_name, "chunksize": chunksize, "resume_from": resume_from}
+    await run_file_pipeline(csv_files, iter_address_chunks, write, state, workers=workers, finish=finish)
+    await invalidate_count(Address)
+    console.print(f"[green]Address bulk processing completed. {totals['merged']} addresses merged, {totals['deleted']} deleted.[/green]")
+
+
+# Columns added to `GeoData` after its table could have been created, with their SQL types.
+GEO_DATA_COLUMNS = {"geojson_medium": "JSONB", "geojson_low": "JSONB", "bbox": "JSONB"}
+
+
+async def migrate_geo_data() -> List[str]:
+    """
+    Give an existing geo data table the columns added to `GeoData` since, `generate_schemas` only creating
+    missing tables: the simplified geometries and the bounding box.
+
+    Returns:
+        List[str]: The columns added.
+    """
+    client = Tortoise.get_connection("default")
+    async with client.acquire_connection() as connection:
+        added = await add_missing_columns(connection, GeoData._meta.db_table, GEO_DATA_COLUMNS)
+
+    if added:
+        console.print(f"[cyan]Added the geo data columns: {', '.join(added)}.[/cyan]")
+    return added
+
+
+def _seek_features(f, chunk_size: int) -> Optional[str]:
+    """Read a GeoJSON file up to the opening of its features array, returns what follows it or None without one."""
+    buffer = ""
+    while True:
+        key = buffer.find('"features"')
+        start = buffer.find("[", key) if key != -1 else -1
+        if start != -1:
+            return buffer[start + 1 :]
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return None
+        buffer += chunk
+
+
+def iter_geojson_features(file_path: Path, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    """
+    Yield the features of a GeoJSON FeatureCollection one at a time, without loading the whole file.
+
+    The file is read in chunks and each feature decoded as soon as it is complete, so memory is bounded by
+    the largest feature rather than the file. When a feature spans more than the buffer, the next read is
+    as large as the buffer, which keeps re-decoding attempts linear in the feature size.
+    """
+    decoder = json.JSONDecoder()
+    with open(file_path, "r", encoding="utf-8") as f:
+        buffer = _seek_features(f, chunk_size)
+        while buffer is not None:
+            position = len(buffer) - len(buffer.lstrip(" \t\r\n,"))
+            if buffer.startswith("]", position):
+                return
+
+            try:
+                if position == len(buffer):
+                    raise json.JSONDecodeError("Incomplete feature", buffer, position)
+                feature, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                chunk = f.read(max(chunk_size, len(buffer)))
+                if not chunk:
+                    raise
+                buffer = buffer[position:] + chunk
                 continue
-            street_name = str(street_name).strip()
 
-            if not code_postal or pd.isna(code_postal):
-                # console.print(f"[yellow]Skipping row due to empty postal code in {csv_path.name}.[/yellow]")
-                continue
-            code_postal = str(code_postal).strip()
+            yield feature
+            buffer = buffer[end:]
 
-            street_identifier = f"{street_name} {row_dict.get('street_type', '')}".strip()
-            street_instance = streets_map_by_name.get(street_identifier)
 
-            if not street_instance:
-                # console.print(f"[yellow]Skipping address '{street_identifier}' (Postal: {postal_code}) due to missing street. File: {csv_path.name}[/yellow]")
-                continue
+async def upsert_geo_data(batch: List[Tuple[dict, dict, dict]]) -> int:
+    """
+    Upsert a batch of region features and their simplified variants into GeoData.
 
-            address_identifier = (street_instance.id, number, code_postal)
-            if address_identifier in processed_identifiers:
-                continue
-            processed_identifiers.add(address_identifier)
-            address_obj_data = {
-                "street": street_instance,
-                "number": number,
-                "postal_code": code_postal,
-                "latitude": latitude,
-                "longitude": longitude,
-            }
-            if "code_insee" in row_dict and row_dict["code_insee"]:
-                address_obj_data["code_insee"] = row_dict["code_insee"]
+    The administrative levels and the existing rows of the whole batch are fetched with one query each,
+    then rows are updated and created in bulk.
+    """
+    codes = [feature["properties"]["code"] for feature, _, _ in batch]
+    levels = {level.code_insee: level for level in await AdministrativeLevelOne.filter(code_insee__in=codes)}
+    existing = {row.administrative_level_one_id: row for row in await GeoData.filter(administrative_level_one_id__in=[level.code for level in levels.values()])}
 
-            all_address_objects_to_create.append(Address(**address_obj_data))
-
-        if not all_address_objects_to_create:
-            console.print("[yellow]No valid address data collected from CSV files to create.[/yellow]")
-            return
-
-    # --- 2. Bulk create addresses ---
-    console.print(f"[cyan]Attempting to bulk create/update {len(all_address_objects_to_create)} addresses...[/cyan]")
-    try:
-        await Address.bulk_create(all_address_objects_to_create, ignore_conflicts=True)
-        # Note: `ignore_conflicts=True` doesn't usually return which objects were created vs. ignored.
-        console.print(f"[green]Address bulk processing completed. {len(all_address_objects_to_create)} candidates processed.[/green]")
+    to_create, to_update = [], []
+    for feature, feature_medium, feature_low in batch:
+        level = levels.get(feature["properties"]["code"])
+        if level is None:
+            console.print(f"[yellow]AdministrativeLevelOne with code {feature['properties']['code']} not found, skipping.[/yellow]")
+            continue
 
-    except Exception as e:
-        console.print(f"[red]Error during bulk address creation: {e}[/red]")
-        console.print("[yellow]Some addresses may not have been created. Consider retrying or individual processing for failed items.[/yellow]")
+        polygons = parse_polygons(feature)
+        values = {
+            "geojson": feature,
+            "geojson_medium": feature_medium,
+            "geojson_low": feature_low,
+            "bbox": list(bounds(polygons)) if polygons else None,
+        }
+        geo_data = existing.get(level.code)
+        if geo_data is None:
+            to_create.append(GeoData(administrative_level_one_id=level.code, **values))
+        else:
+            geo_data.update_from_dict(values)
+            to_update.append(geo_data)
 
+    if to_update:
+        await GeoData.bulk_update(to_update, fields=["geojson", "geojson_medium", "geojson_low", "bbox"])
+    if to_create:
+        await GeoData.bulk_create(to_create)
 
-async def read_geojson(file_path: Path) -> dict:
-    """Read a GeoJSON file and return its content."""
-    try:
-        with open(file_path, "r", encoding="utf-8") as f:
-            geojson_data = json.load(f)
-        return geojson_data
-    except FileNotFoundError:
-        console.print(f"[red]Error: GeoJSON file not found at {file_path}.[/red]")
-        return {}
-    except json.JSONDecodeError as e:
-        console.print(f"[red]Error decoding GeoJSON file {file_path.name}: {e}[/red]")
-        return {}
-    except Exception as e:
-        console.print(f"[red]Unexpected error reading GeoJSON file {file_path.name}: {e}[/red]")
-        return {}
+    return len(to_create) + len(to_update)
 
 
-async def load_geo_data():
+async def load_geo_data(batch_size: int = 50):
     """Load geo data from GeoJSON files into the database."""
     geojson_path = settings.json_path / "france" / "regions.json"
+    if not geojson_path.exists():
+        console.print(f"[red]Error: GeoJSON file not found at {geojson_path}.[/red]")
+        return
 
     console.print(f"[cyan]Loading geo data from: {geojson_path}...[/cyan]")
-    geo_data = await read_geojson(geojson_path)
+    await migrate_geo_data()
 
-    if not geo_data:
+    # First pass: the vertex keys, so that simplification keeps borders shared across the batches.
+    simplifier = TopologySimplifier()
+    try:
+        for feature in iter_geojson_features(geojson_path):
+            simplifier.add(feature.get("geometry"))
+    except json.JSONDecodeError as e:
+        console.print(f"[red]Error decoding GeoJSON file {geojson_path.name}: {e}[/red]")
+        return
+
+    if not simplifier.count:
         console.print("[red]No valid geo data found to process.[/red]")
         return
 
-    for feature in geo_data.get("features", []):
-        code_insee = feature["properties"].get("code")
-        if not code_insee:
-            console.print(f"[yellow]Skipping feature without INSEE code: {feature['properties']}[/yellow]")
+    # Second pass: simplify and upsert a batch of features at a time.
+    console.print(f"[cyan]Simplifying and loading {simplifier.count} geometries...[/cyan]")
+    loaded, batch = 0, []
+    for feature in iter_geojson_features(geojson_path):
+        if not feature.get("properties", {}).get("code"):
+            console.print(f"[yellow]Skipping feature without INSEE code: {feature.get('properties')}[/yellow]")
             continue
 
-        level_one_instance = await AdministrativeLevelOne.get_or_none(code_insee=code_insee)
-        if not level_one_instance:
-            console.print(f"[yellow]AdministrativeLevelOne with code {code_insee} not found. Creating new instance.[/yellow]")
-            level_one_instance = await AdministrativeLevelOne.create(code_insee=code_insee, geojson=feature)
+        batch.append(
+            (
+                feature,
+                simplifier.simplify_feature(feature, settings.geo_simplify_tolerance_medium),
+                simplifier.simplify_feature(feature, settings.geo_simplify_tolerance_low),
+            )
+        )
+        if len(batch) >= batch_size:
+            loaded += await upsert_geo_data(batch)
+            batch = []
 
-        await GeoData.update_or_create(geojson=feature, administrative_level_one=level_one_instance)
+    if batch:
+        loaded += await upsert_geo_data(batch)
 
-    console.print("[green]Geo data loaded successfully.[/green]")
+    await bump_tiles_version()
+    console.print(f"[green]Geo data loaded successfully, {loaded} geometries.[/green]")
@@ -7,6 +7,7 @@ import requests
 import typer
 from bs4 import BeautifulSoup
 from cli_utils import (
+    clear_checkpoints,
     load_addresses,
     load_cities,
     load_cities_data,
@@ -14,6 +15,9 @@ from cli_utils import (
     load_geo_data,
     load_street_types,
     load_streets,
+    migrate_address_key,
+    migrate_geo_data,
+    run_stage,
 )
 from rich import print as r_print
 from rich.console import Console
@@ -27,6 +31,8 @@ from config import Settings
 from models.auth import Permission
 from models.core import Menu
 from models.geo import AdministrativeLevelOne, Continent, Country, GeoData
+from utils.geocoder import build_geocoder_index
+from utils.store import build_address_store
 
 app = typer.Typer()
 settings = Settings()
@@ -158,14 +164,14 @@ def loaddev(flags: List[str] = []):
     if not flags:
         # No flags: run everything by default
         loadallfixtures("dev")
-        loaddatasets()
+        loaddatasets(workers=1, force=False, resume=False)
         loadgeodata()
         return
 
     if "fixtures" in flags:
         loadallfixtures("dev")
     if "datasets" in flags:
-        loaddatasets()
+        loaddatasets(workers=1, force=False, resume=False)
     if "geodata" in flags:
         loadgeodata()
 
@@ -311,7 +317,11 @@ def fetchdatasets():
 
 
 @app.command()
-def loaddatasets():
+def loaddatasets(
+    workers: int = typer.Option(1, "--workers", "-w", min=1, help="Processes parsing the street and address files in parallel"),
+    force: bool = typer.Option(False, "--force", help="Reload the street and address files even when unchanged since their last load"),
+    resume: bool = typer.Option(False, "--resume", help="Continue the previous import from its last committed chunk"),
+):
     """Load datasets from CSV files into the database."""
 
     async def _load_datasets():
@@ -320,21 +330,23 @@ def loaddatasets():
             modules={"models": [f"models.{model}" for model in settings.models]},
         )
         console.print("[bold cyan]Loading datasets...[/bold cyan]")
+        if not resume:
+            await clear_checkpoints()
 
         console.print(f"[blue]Processing:[/blue] cities.")
-        await load_cities()
+        await run_stage("cities", load_cities, resume)
 
         console.print(f"[blue]Processing:[/blue] cities data.")
-        await load_cities_data()
+        await run_stage("cities_data", load_cities_data, resume)
 
         console.print(f"[blue]Processing:[/blue] street types.")
-        await load_street_types()
+        await run_stage("street_types", load_street_types, resume)
 
         console.print(f"[blue]Processing:[/blue] streets.")
-        await load_streets()
+        await load_streets(workers=workers, force=force, resume=resume)
 
         console.print(f"[blue]Processing:[/blue] addresses.")
-        await load_addresses()
+        await load_addresses(workers=workers, force=force, resume=resume)
 
         await Tortoise.close_connections()
         console.print("[green]✅ All datasets loaded successfully.[/green]")
@@ -342,6 +354,65 @@ def loaddatasets():
     run_async(_load_datasets())
 
 
+@app.command()
+def migrateaddresskey(dedupe: bool = typer.Option(False, "--dedupe", help="Merge the addresses sharing a street, number and repetition index")):
+    """Add the source column and unique key the address loader merges on to existing address tables."""
+
+    async def _migrate_address_key():
+        await Tortoise.init(
+            db_url=settings.db_url,
+            modules={"models": [f"models.{model}" for model in settings.models]},
+        )
+        await migrate_address_key(dedupe=dedupe)
+        await Tortoise.close_connections()
+
+    run_async(_migrate_address_key())
+
+
+@app.command()
+def migrategeodata():
+    """Add the simplified geometry and bounding box columns to existing geo data tables, before serving them."""
+
+    async def _migrate_geo_data():
+        await Tortoise.init(
+            db_url=settings.db_url,
+            modules={"models": [f"models.{model}" for model in settings.models]},
+        )
+        await migrate_geo_data()
+        await Tortoise.close_connections()
+
+    run_async(_migrate_geo_data())
+
+
+@app.command()
+def buildaddressstore():
+    """
+    Build the memory-mapped address store, its spatial index and geocoder postings, to run after loaddatasets.
+
+    Running API workers map the new store within `address_store_check_interval` seconds.
+    """
+
+    async def _build_address_store():
+        await Tortoise.init(
+            db_url=settings.db_url,
+            modules={"models": [f"models.{model}" for model in settings.models]},
+        )
+        try:
+            console.print("[bold cyan]Building address store...[/bold cyan]")
+            meta = await build_address_store(settings.store_path, settings.address_grid_cell, indexes=(build_geocoder_index,))
+            console.print(f"[green]✅ Address store built: {meta['cities']} cities, {meta['streets']} streets, {meta['addresses']} addresses.[/green]")
+        finally:
+            await Tortoise.close_connections()
+
+    run_async(_build_address_store())
+
+
+@app.command()
+def buildgeocoder():
+    """Build the offline geocoder index, which lives in the address store: same as buildaddressstore."""
+    buildaddressstore()
+
+
 @app.command()
 def loadgeodata():
     """Load geographical data from the web and store it in the database."""
@@ -22,6 +22,7 @@ from models.geo import (
     Language,
     Street,
 )
+from utils.reference import reference_data
 
 app = typer.Typer()
 settings = Settings()
@@ -37,10 +38,10 @@ def listcontinents():
             db_url=settings.db_url,
             modules={"models": ["models.geo"]},
         )
-        _continents = await Continent.all()
+        _continents = await reference_data.all(Continent)
         table = Table("Code", "Name")
         for continent in _continents:
-            table.add_row(continent.code, continent.name)
+            table.add_row(continent["code"], continent["name"])
         console.print(table)
 
         await Tortoise.close_connections()
@@ -58,6 +59,7 @@ def createcontinent(code: str, name: str):
             modules={"models": ["models.geo"]},
         )
         _continent = await Continent.create(code=code, name=name)
+        await reference_data.invalidate(Continent)
         typer.echo(_continent)
 
         await Tortoise.close_connections()
@@ -75,9 +77,9 @@ def getcontinent(code: str):
             modules={"models": ["models.geo"]},
         )
         try:
-            _continent = await Continent.get(code=code)
+            _continent = await reference_data.get(Continent, code)
             table = Table("Code", "Name")
-            table.add_row(_continent.code, _continent.name)
+            table.add_row(_continent["code"], _continent["name"])
             console.print(table)
 
         except DoesNotExist:
@@ -111,6 +113,7 @@ def createcurrency(
             modules={"models": ["models.geo"]},
         )
         _currency = await Currency.create(code=code, code_numeric=code_numeric, name=name, minor_unit=minor_unit)
+        await reference_data.invalidate(Currency)
         typer.echo(_currency)
 
         await Tortoise.close_connections()
@@ -127,14 +130,14 @@ def listcurrencies():
             db_url=settings.db_url,
             modules={"models": ["models.geo"]},
         )
-        _currencies = await Currency.all()
+        _currencies = await reference_data.all(Currency)
         table = Table("Code", "Code numeric", "Name", "Minor Unit")
         for currency in _currencies:
             table.add_row(
-                currency.code,
-                currency.code_numeric,
-                currency.name,
-                str(currency.minor_unit),
+                currency["code"],
+                currency["code_numeric"],
+                currency["name"],
+                str(currency["minor_unit"]),
             )
         console.print(table)
 
@@ -153,13 +156,13 @@ def getcurrency(code: str):
             modules={"models": ["models.geo"]},
         )
         try:
-            _currency = await Currency.get(code=code)
+            _currency = await reference_data.get(Currency, code)
             table = Table("Code", "Code numeric", "Name", "Minor Unit")
             table.add_row(
-                _currency.code,
-                _currency.code_numeric,
-                _currency.name,
-                str(_currency.minor_unit),
+                _currency["code"],
+                _currency["code_numeric"],
+                _currency["name"],
+                str(_currency["minor_unit"]),
             )
             console.print(table)
 
@@ -180,10 +183,10 @@ def listlanguages():
             db_url=settings.db_url,
             modules={"models": ["models.geo"]},
         )
-        _languages = await Language.all()
+        _languages = await reference_data.all(Language)
         table = Table("Code", "Name")
         for language in _languages:
-            table.add_row(language.code, language.name)
+            table.add_row(language["code"], language["name"])
         console.print(table)
 
         await Tortoise.close_connections()
@@ -201,6 +204,7 @@ def createlanguage(code: str, name: str):
             modules={"models": ["models.geo"]},
         )
         _language = await Language.create(code=code, name=name)
+        await reference_data.invalidate(Language)
         typer.echo(_language)
 
         await Tortoise.close_connections()
@@ -218,9 +222,9 @@ def getlanguage(code: str):
             modules={"models": ["models.geo"]},
         )
         try:
-            _language = await Language.get(code=code)
+            _language = await reference_data.get(Language, code)
             table = Table("Code", "Name")
-            table.add_row(_language.code, _language.name)
+            table.add_row(_language["code"], _language["name"])
             console.print(table)
 
         except DoesNotExist:
@@ -240,10 +244,10 @@ def listcountries():
             db_url=settings.db_url,
             modules={"models": ["models.geo"]},
         )
-        _countries = await Country.all()
+        _countries = await reference_data.all(Country)
         table = Table("Code Iso 2", "Code Iso 3")
         for country in _countries:
-            table.add_row(country.code_iso2, country.code_iso3)
+            table.add_row(country["code_iso2"], country["code_iso3"])
         console.print(table)
 
         await Tortoise.close_connections()
@@ -291,6 +295,7 @@ def createcountry(
             continent=_continent,
             currency=_currency,
         )
+        await reference_data.invalidate(Country)
         typer.echo(_country)
 
         await Tortoise.close_connections()
@@ -308,7 +313,10 @@ def getcountry(code_iso2: str):
             modules={"models": ["models.geo"]},
         )
         try:
-            _country = await Country.get(code_iso2=code_iso2).prefetch_related("continent", "currency", "language_official")
+            _country = await reference_data.get(Country, code_iso2)
+            _language = await reference_data.get(Language, _country["language_official_id"])
+            _continent = await reference_data.get(Continent, _country["continent_id"])
+            _currency = await reference_data.get(Currency, _country["currency_id"])
             table = Table(
                 "Code Iso 2",
                 "Code Iso 3",
@@ -319,13 +327,13 @@ def getcountry(code_iso2: str):
                 "Currency",
             )
             table.add_row(
-                _country.code_iso2,
-                _country.code_iso3,
-                _country.onu_code,
-                _country.name,
-                _country.language_official.name,
-                _country.continent.name,
-                _country.currency.name,
+                _country["code_iso2"],
+                _country["code_iso3"],
+                _country["onu_code"],
+                _country["name"],
+                _language["name"],
+                _continent["name"],
+                _currency["name"],
             )
             console.print(table)
 
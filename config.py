@@ -29,6 +29,57 @@ class Settings(BaseSettings):
     cache_port: int = 6379
     cache_db: int = 0
     cache_ttl: int = 60
+    cache_max_connections: int = 50
+    cache_socket_timeout: float = 0.5
+    cache_breaker_failure_threshold: int = 5
+    cache_breaker_reset_timeout: float = 30
+    cache_local_enabled: bool = False
+    cache_local_max_entries: int = 10000
+    cache_local_max_bytes: int = 64 * 1024 * 1024
+    cache_local_ttl: int = 30
+    cache_invalidation_channel: str = "cache:invalidate"
+    cache_count_ttl: int = 300
+    reference_data_check_interval: int = 30
+    # HTTP
+    http_timeout: float = 5.0
+    http_connect_timeout: float = 2.0
+    http_max_connections: int = 100
+    http_max_keepalive_connections: int = 20
+    http_keepalive_expiry: float = 30.0
+    http_max_retries: int = 2
+    http_retry_backoff: float = 0.1
+    http_retry_ratio: float = 0.2
+    http_retry_burst: int = 10
+    # GEOCODER
+    geocoder_url: str = "https://api-adresse.data.gouv.fr"
+    geocoder_cache_prefix: str = "geo:search:v1"
+    geocoder_cache_ttl: int = 600
+    geocoder_stale_ttl: int = 3600
+    geocoder_negative_ttl: int = 60
+    geocoder_lock_ttl: float = 5.0
+    geocoder_lock_poll: float = 0.05
+    geocoder_failure_ttl: float = 2.0
+    geocoder_local_enabled: bool = True
+    geocoder_remote_fallback: bool = True
+    geocoder_local_min_score: float = 0.5
+    address_store_enabled: bool = True
+    address_store_check_interval: int = 30
+    address_grid_cell: float = 0.01
+    address_nearby_max_radius: float = 5000
+    address_bbox_max_span: float = 0.1
+    address_query_max_limit: int = 500
+    address_reverse_max_distance: float = 2000
+    geo_simplify_tolerance_medium: float = 0.001
+    geo_simplify_tolerance_low: float = 0.01
+    tiles_max_zoom: int = 14
+    tiles_medium_min_zoom: int = 6
+    tiles_full_min_zoom: int = 10
+    tiles_cache_ttl: int = 86400
+    geo_data_stream_batch: int = 20
+    # DATASETS
+    dataset_chunk_size: int = 100_000
+    dataset_batch_size: int = 50_000
+    dataset_max_writers: int = 4
     # RABBITMQ
     rabbitmq_user: str = "admin"
     rabbitmq_password: str = "admin"
@@ -51,6 +102,7 @@ class Settings(BaseSettings):
         "data",
         "data/csv",
         "data/json",
+        "data/store",
         "uploads",
         "uploads/avatars",
         "uploads/documents",
@@ -75,3 +127,7 @@ class Settings(BaseSettings):
     @property
     def json_path(self) -> Path:
         return Path(__file__).resolve().parent / "data" / "json"
+
+    @property
+    def store_path(self) -> Path:
+        return Path(__file__).resolve().parent / "data" / "store" / "addresses"
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+import asyncio
 import logging
 import os
 from contextlib import asynccontextmanager
@@ -14,7 +15,13 @@ from pythonjsonlogger import jsonlogger
 import signals  # noqa
 from config import Settings
 from routers.v1 import router as v1_router
+from utils.cache import close_cache, listen_for_invalidations, local_cache
 from utils.db import Database
+from utils.geocoder import geocoder
+from utils.http import close_http_client, open_http_client
+from utils.reference import reference_data
+from utils.regions import region_index
+from utils.store import address_store
 
 settings = Settings()
 logger = logging.getLogger("uvicorn")
@@ -46,7 +53,19 @@ logger_auth.addHandler(file_handler_auth)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await open_http_client()
+    await reference_data.load()
+    await region_index.load()
+    if settings.address_store_enabled and address_store.open(settings.store_path):
+        logger.info(f"Address store mapped, {len(address_store.addresses)} addresses")
+        if settings.geocoder_local_enabled and geocoder.open(address_store):
+            logger.info(f"Local geocoder mapped, {len(geocoder.vocabulary)} tokens")
+    listener = asyncio.create_task(listen_for_invalidations()) if local_cache is not None else None
     yield
+    if listener is not None:
+        listener.cancel()
+    await close_http_client()
+    await close_cache()
 
 
 app = FastAPI(title=settings.app_name, version=settings.app_version, lifespan=lifespan)
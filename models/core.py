@@ -51,3 +51,39 @@ class Tag(Model):
 
     def __str__(self):
         return self.name
+
+
+class DatasetFile(Model):
+    """Model for the source files loaded by `loaddatasets`, fingerprinted to skip the unchanged ones."""
+
+    id = fields.IntField(primary_key=True)
+    stage = fields.CharField(max_length=50)
+    path = fields.CharField(max_length=255)
+    size = fields.BigIntField()
+    mtime = fields.FloatField()
+    sha256 = fields.CharField(max_length=64)
+    rows = fields.IntField(default=0)
+    loaded_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("stage", "path")
+
+    def __str__(self):
+        return f"{self.stage}: {self.path}"
+
+
+class ImportCheckpoint(Model):
+    """Model for the progress of `loaddatasets`: the last chunk committed of each file of a stage."""
+
+    id = fields.IntField(primary_key=True)
+    stage = fields.CharField(max_length=50)
+    path = fields.CharField(max_length=255, default="")
+    chunk = fields.IntField(default=-1)
+    done = fields.BooleanField(default=False)
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("stage", "path")
+
+    def __str__(self):
+        return f"{self.stage}: {self.path} ({self.chunk})"
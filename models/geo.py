@@ -1,13 +1,37 @@
+import asyncio
 import json
+import time
 from enum import IntEnum
+from typing import List, Optional
+from uuid import uuid4
 
-from httpx import AsyncClient
+from httpx import TransportError
 from tortoise import fields
 from tortoise.manager import Manager
 from tortoise.models import Model
 from tortoise.queryset import QuerySet
 
-from utils.cache import get_from_cache, set_in_cache
+from config import Settings
+from utils.cache import (
+    aacquire_lock,
+    afail_lock,
+    aget_from_cache,
+    alock_failed,
+    arelease_lock,
+    aset_in_cache,
+)
+from utils.http import get_with_retry
+from utils.singleflight import SingleFlight
+from utils.text import normalize_text
+
+settings = Settings()
+address_search_flight = SingleFlight()
+_background_refreshes = set()
+
+
+def address_search_key(address: str) -> str:
+    """Cache key of an address search, shared by the case, spacing and accent variants of the query."""
+    return f"{settings.geocoder_cache_prefix}:{normalize_text(address)}"
 
 
 class AdministrativeLevelsEnum(IntEnum):
@@ -285,6 +309,8 @@ class Address(Model):
     complement = fields.CharField(max_length=50, null=True)
     latitude = fields.FloatField(null=True)
     longitude = fields.FloatField(null=True)
+    # The dataset file the address was last loaded from, to delete the addresses a new version drops.
+    source = fields.CharField(max_length=64, null=True, index=True)
 
     street = fields.ForeignKeyField("models.Street", related_name="street", null=True)
 
@@ -329,27 +355,94 @@ class Address(Model):
             dict: The response from the API.
             bool: True if the response is from the cache, False otherwise.
         """
-        response = None
-        is_cached = False
-
-        cached_response = get_from_cache(address)
+        key = address_search_key(address)
+        entry = await cls._read_address_search(key)
+        if entry is not None:
+            if time.time() - entry["fetched_at"] > entry["ttl"]:
+                cls._refresh_address_search(key, address)
+            return entry["data"], True
+
+        return await address_search_flight.do(key, lambda: cls._fetch_address_gov(key, address))
+
+    @staticmethod
+    async def _read_address_search(key: str):
+        cached_response = await aget_from_cache(key)
         if cached_response:
-            cached_response = cached_response.decode("utf-8")
+            return json.loads(cached_response.decode("utf-8"))
 
-            response = json.loads(cached_response)
-            is_cached = True
+        return None
 
-        else:
-            async with AsyncClient() as client:
-                api_response = await client.get(f"https://api-adresse.data.gouv.fr/search/?q={address}&limit=5")
-                if api_response.status_code != 200:
-                    return None
+    @classmethod
+    def _refresh_address_search(cls, key: str, address: str):
+        """Refresh a stale search in the background, the caller is served the stale entry meanwhile."""
+        task = asyncio.ensure_future(address_search_flight.do(key, lambda: cls._fetch_address_gov(key, address, wait=False)))
+        _background_refreshes.add(task)
+        task.add_done_callback(_background_refreshes.discard)
 
-                json_response = api_response.json()
-                set_in_cache(address, json.dumps(json_response), 600)
-                response = json_response
+    @classmethod
+    async def _fetch_address_gov(cls, key: str, address: str, wait: bool = True):
+        """
+        Fetch an address search from the API Adresse, once for every worker.
+
+        The first worker to miss takes a short cache lock and calls the API, the others wait for its result
+        to land in the cache. If the API fails the holder swaps its lock for a short failure marker and the
+        waiters give up at once; if no result lands in time (or the cache is down) they call the API themselves.
+        Results are kept `geocoder_cache_ttl` seconds fresh then `geocoder_stale_ttl` seconds stale,
+        searches without match `geocoder_negative_ttl` seconds.
 
-        return response, is_cached
+        Args:
+            key (str): The normalized cache key.
+            address (str): The address to search.
+            wait (bool): Whether to wait for another worker holding the lock, or give up at once.
+
+        Returns:
+            dict: The response from the API.
+            bool: True if the response is from the cache, False otherwise.
+        """
+        lock_key = f"lock:{key}"
+        token = uuid4().hex
+        locked = await aacquire_lock(lock_key, token, settings.geocoder_lock_ttl)
+
+        if locked is False:
+            if not wait:
+                return None, False
+
+            deadline = time.monotonic() + settings.geocoder_lock_ttl
+            while time.monotonic() < deadline:
+                await asyncio.sleep(settings.geocoder_lock_poll)
+                entry = await cls._read_address_search(key)
+                if entry is not None and time.time() - entry["fetched_at"] <= entry["ttl"]:
+                    return entry["data"], True
+                if await alock_failed(lock_key):
+                    return None, False
+
+        failed = False
+        try:
+            api_response = await get_with_retry(f"{settings.geocoder_url}/search/", params={"q": address.strip(), "limit": 5})
+            if api_response.status_code >= 500:
+                failed = True
+                return None, False
+
+            json_response = api_response.json() if api_response.status_code == 200 else None
+            ttl = settings.geocoder_cache_ttl if json_response and json_response.get("features") else settings.geocoder_negative_ttl
+            entry = {"fetched_at": time.time(), "ttl": ttl, "data": json_response}
+            await aset_in_cache(key, json.dumps(entry), ttl + settings.geocoder_stale_ttl)
+
+        except TransportError:
+            failed = True
+            return None, False
+
+        finally:
+            if locked and failed:
+                await afail_lock(lock_key, token, settings.geocoder_failure_ttl)
+            elif locked:
+                await arelease_lock(lock_key, token)
+
+        return json_response, False
+
+    class Meta:
+        # The BAN loader stores a missing repetition index as "" so re-imports hit this constraint.
+        unique_together = ("street", "number", "number_extension")
 
     def __str__(self):
         return f"{self.number} {self.street}"
@@ -358,7 +451,14 @@ class Address(Model):
 class GeoData(Model):
     """Model for geographical data."""
 
+    # Geometry column of each resolution, the simplified ones are computed by `load_geo_data`.
+    RESOLUTIONS = {"full": "geojson", "medium": "geojson_medium", "low": "geojson_low"}
+    LINKED_ENTITIES = ("continent", "country", "administrative_level_one", "administrative_level_two", "city", "street")
+
     geojson = fields.JSONField(null=True)
+    geojson_medium = fields.JSONField(null=True)
+    geojson_low = fields.JSONField(null=True)
+    bbox = fields.JSONField(null=True)  # [min_lon, min_lat, max_lon, max_lat] of the geometry
 
     continent = fields.ForeignKeyField("models.Continent", related_name="geo_data_continent", null=True)
     country = fields.ForeignKeyField("models.Country", related_name="geo_data_country", null=True)
@@ -382,18 +482,30 @@ class GeoData(Model):
 
     @property
     def linked_entity_type(self):
-        for field in [
-            "continent",
-            "country",
-            "administrative_level_one",
-            "administrative_level_two",
-            "city",
-            "street",
-        ]:
+        for field in self.LINKED_ENTITIES:
             if getattr(self, f"{field}_id") is not None:
                 return field
         return None
 
+    @classmethod
+    async def fill_missing_resolution(cls, rows: List[dict], column: str, key: Optional[str] = None) -> List[dict]:
+        """
+        Fall back to the full geometry in fetched rows whose simplified `column` is not computed yet.
+
+        Rows loaded before the simplified columns existed have them NULL until `loadgeodata` runs again;
+        only those rows get their `geojson` fetched. `key` is the name the column was fetched under.
+        """
+        key = key or column
+        missing = [row["id"] for row in rows if row[key] is None]
+        if column == "geojson" or not missing:
+            return rows
+
+        full = dict(await cls.filter(id__in=missing).values_list("id", "geojson"))
+        for row in rows:
+            if row[key] is None:
+                row[key] = full.get(row["id"])
+        return rows
+
     async def save(self, *args, **kwargs):
         """Override save method to validate single foreign key."""
         self.validate_single_fk()
@@ -1,5 +1,5 @@
 import logging
-from typing import Annotated
+from typing import Annotated, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from fastapi.responses import JSONResponse
@@ -27,6 +27,7 @@ from utils.crypt import (
     generate_token,
     hash_password,
 )
+from utils.pagination import paginate
 
 logger = logging.getLogger("auth")
 router = APIRouter()
@@ -213,47 +214,25 @@ async def create_api_key():
 
 
 @router.get("/tokens", response_model=PaginatedResponse[TokenRead], response_model_by_alias=False)
-async def get_tokens(page: int = Query(1, ge=1), size: int = Query(10, ge=1)):
+async def get_tokens(page: int = Query(1, ge=1), size: int = Query(10, ge=1), cursor: Optional[str] = Query(None)):
     """Get paginated list of tokens."""
-    count = await Token.all().count()
-    offset = (page - 1) * size
-    _tokens = await Token.all().offset(offset).limit(size).values("token", "created_at", "user__id")
-
-    return PaginatedResponse[TokenRead](
-        count=count,
-        page=page,
-        size=size,
-        data=_tokens,
-    )
+    return await paginate(PaginatedResponse[TokenRead], Token, ("token", "created_at", "user__id"), size, page=page, cursor=cursor)
 
 
 @router.get("/refreshes", response_model=PaginatedResponse[RefreshRead], response_model_by_alias=False)
-async def get_refresh_tokens(page: int = Query(1, ge=1), size: int = Query(10, ge=1)):
+async def get_refresh_tokens(page: int = Query(1, ge=1), size: int = Query(10, ge=1), cursor: Optional[str] = Query(None)):
     """Get paginated list of refresh tokens."""
-    count = await Refresh.all().count()
-    offset = (page - 1) * size
-    _refresh_tokens = await Refresh.all().offset(offset).limit(size).values("token", "created_at", "expire_at", "user__id")
-
-    return PaginatedResponse[RefreshRead](
-        count=count,
-        page=page,
-        size=size,
-        data=_refresh_tokens,
-    )
+    return await paginate(PaginatedResponse[RefreshRead], Refresh, ("token", "created_at", "expire_at", "user__id"), size, page=page, cursor=cursor)
 
 
 @router.get("/sessions", response_model=PaginatedResponse[SessionRead], response_model_by_alias=False)
-async def get_sessions(page: int = Query(1, ge=1), size: int = Query(10, ge=1)):
+async def get_sessions(page: int = Query(1, ge=1), size: int = Query(10, ge=1), cursor: Optional[str] = Query(None)):
     """Get paginated list of sessions."""
-    count = await Session.all().count()
-    offset = (page - 1) * size
-    _sessions = (
-        await Session.all().offset(offset).limit(size).values("id", "ip_v4", "ip_v6", "ip_type", "ip_class", "isp", "os", "user_agent", "created_at", "updated_at", "user__id")
-    )
-
-    return PaginatedResponse[SessionRead](
-        count=count,
+    return await paginate(
+        PaginatedResponse[SessionRead],
+        Session,
+        ("id", "ip_v4", "ip_v6", "ip_type", "ip_class", "isp", "os", "user_agent", "created_at", "updated_at", "user__id"),
+        size,
         page=page,
-        size=size,
-        data=_sessions,
+        cursor=cursor,
     )
@@ -8,6 +8,7 @@ from config import Settings
 from models.clients import Client
 from models.users import User
 from models.core import Menu
+from utils.cache import breaker, local_cache
 from utils.security import get_current_user_or_client
 
 settings = Settings()
@@ -32,6 +33,14 @@ async def health():
     return Response(status_code=200)
 
 
+@router.get("/metrics")
+async def metrics():
+    """
+    Runtime metrics of the API dependencies.
+    """
+    return JSONResponse(content={"cache_circuit": breaker.metrics(), "cache_local": local_cache.metrics() if local_cache else None})
+
+
 @router.get("/info", responses={200: {"description": "API information"}, 401: {"description": "Unauthorized"}})
 async def info(request: Request, current_user_or_client: Annotated[User | Client, Depends(get_current_user_or_client)]):
     """
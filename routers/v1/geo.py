@@ -1,7 +1,10 @@
-from typing import Annotated, List
+import json
+from typing import Annotated, List, Literal, Optional
 
-from fastapi import APIRouter, Query, status
+from fastapi import APIRouter, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 
+from config import Settings
 from models.geo import (  # CityType,
     Address,
     AdministrativeLevelOne,
@@ -37,43 +40,52 @@ from schemas.geo import (
     CurrencyCreate,
     LanguageCreate,
     PhoneNumberCreate,
+    RegionLookup,
     StreetCreate,
     StreetRead,
     StreetTypeCreate,
     TopLevelDomainCreate,
 )
 from schemas.pagination import PaginatedResponse
-
+from utils.geocoder import geocoder
+from utils.pagination import CountStrategy, paginate
+from utils.reference import reference_data
+from utils.regions import region_index
+from utils.store import address_store
+from utils.tiles import etag, tile_source
+
+settings = Settings()
 router = APIRouter()
 
 
 @router.get("/languages")
 async def get_languages():
-    _languages = await Language.all()
+    _languages = await reference_data.all(Language)
     return _languages
 
 
 @router.get("/languages/{language}")
 async def get_language(language: str):
-    _language = await Language.get(code=language)
+    _language = await reference_data.get(Language, language)
     return _language
 
 
 @router.post("/languages")
 async def create_language(language: LanguageCreate):
     _language = await Language.create(code=language.code, name=language.name)
+    await reference_data.invalidate(Language)
     return _language
 
 
 @router.get("/currencies")
 async def get_currencies():
-    _currencies = await Currency.all()
+    _currencies = await reference_data.all(Currency)
     return _currencies
 
 
 @router.get("/currencies/{currency}")
 async def get_currency(currency: str):
-    _currency = await Currency.get(code=currency)
+    _currency = await reference_data.get(Currency, currency)
     return _currency
 
 
@@ -86,18 +98,19 @@ async def create_currency(currency: CurrencyCreate):
         symbol=currency.symbol,
         minor_unit=currency.minor_unit,
     )
+    await reference_data.invalidate(Currency)
     return _currency
 
 
 @router.get("/calling-codes")
 async def get_calling_codes():
-    _calling_codes = await CallingCode.all()
+    _calling_codes = await reference_data.all(CallingCode)
     return _calling_codes
 
 
 @router.get("/calling-codes/{calling_code}")
 async def get_calling_code(calling_code: str):
-    _calling_code = await CallingCode.get(code=calling_code)
+    _calling_code = await reference_data.get(CallingCode, calling_code)
     return _calling_code
 
 
@@ -105,6 +118,7 @@ async def get_calling_code(calling_code: str):
 async def create_calling_code(calling_code: CallingCodeCreate):
     _country = await Country.get(code_iso2=calling_code.country)
     _calling_code = await CallingCode.create(code=calling_code.code, country=_country)
+    await reference_data.invalidate(CallingCode)
     return _calling_code
 
 
@@ -129,13 +143,13 @@ async def create_phone_number(phone_number: PhoneNumberCreate):
 
 @router.get("/top-level-domains")
 async def get_top_level_domains():
-    _top_level_domains = await TopLevelDomain.all()
+    _top_level_domains = await reference_data.all(TopLevelDomain)
     return _top_level_domains
 
 
 @router.get("/top-level-domains/{top_level_domain}")
 async def get_top_level_domain(top_level_domain: str):
-    _top_level_domain = await TopLevelDomain.get(code=top_level_domain)
+    _top_level_domain = await reference_data.get(TopLevelDomain, top_level_domain)
     return _top_level_domain
 
 
@@ -151,66 +165,62 @@ async def create_top_level_domain(top_level_domain: TopLevelDomainCreate):
         ipv6=top_level_domain.ipv6,
         country=_country,
     )
+    await reference_data.invalidate(TopLevelDomain)
     return _top_level_domain
 
 
 @router.get("/continents", response_model=PaginatedResponse[ContinentRead])
-async def get_continents(page: int = Query(1, ge=1), size: int = Query(10, ge=1)):
+async def get_continents(page: int = Query(1, ge=1), size: int = Query(10, ge=1), cursor: Optional[str] = Query(None)):
     """Retrieve a list of continents."""
-    count = await Continent.all().count()
-    offset = (page - 1) * size
-    _continents = await Continent.all().offset(offset).limit(size).values("code", "name")
+    _continents = await reference_data.all(Continent)
+    _page, next_cursor = await reference_data.page(Continent, size, page=page, cursor=cursor)
     return PaginatedResponse[ContinentRead](
-        count=count,
-        page=page,
+        count=len(_continents),
+        page=None if cursor else page,
         size=size,
-        data=_continents,
+        next_cursor=next_cursor,
+        data=_page,
     )
 
 
 @router.post("/continents")
 async def create_continent(continent: ContinentCreate):
     _continent = await Continent.create(code=continent.code, name=continent.name)
+    await reference_data.invalidate(Continent)
     return _continent
 
 
 @router.get("/continents/{continent}")
 async def get_continent(continent: str):
-    _continent = await Continent.get(code=continent)
+    _continent = await reference_data.get(Continent, continent)
     return _continent
 
 
 @router.get("/countries", response_model=PaginatedResponse[CountryRead], response_model_by_alias=False)
-async def get_countries(page: int = Query(1, ge=1), size: int = Query(10, ge=1)):
-    count = await Country.all().count()
-    offset = (page - 1) * size
-
-    _countries = (
-        await Country.all()
-        .offset(offset)
-        .limit(size)
-        .values(
-            "code_iso2",
-            "code_iso3",
-            "onu_code",
-            "name",
-            "language_official__code",
-            "continent__code",
-            "currency__code",
-        )
-    )
+async def get_countries(page: int = Query(1, ge=1), size: int = Query(10, ge=1), cursor: Optional[str] = Query(None)):
+    _countries = await reference_data.all(Country)
+    _page, next_cursor = await reference_data.page(Country, size, page=page, cursor=cursor)
 
     return PaginatedResponse[CountryRead](
-        count=count,
-        page=page,
+        count=len(_countries),
+        page=None if cursor else page,
         size=size,
-        data=_countries,
+        next_cursor=next_cursor,
+        data=[
+            {
+                **country,
+                "language_official": country["language_official_id"],
+                "continent": country["continent_id"],
+                "currency": country["currency_id"],
+            }
+            for country in _page
+        ],
     )
 
 
 @router.get("/countries/{country}")
 async def get_country(country: str):
-    _country = await Country.get(code_iso2=country)
+    _country = await reference_data.get(Country, country)
     return _country
 
 
@@ -228,20 +238,21 @@ async def create_country(country: CountryCreate):
         continent=_continent,
         currency=_currency,
     )
+    await reference_data.invalidate(Country)
     return _country
 
 
 @router.get("/administrative-levels-ones", response_model=PaginatedResponse[AdministrativeLevelOneRead], response_model_by_alias=False)
-async def get_administrative_levels_one(page: int = Query(1, ge=1), size: int = Query(10, ge=1)):
+async def get_administrative_levels_one(page: int = Query(1, ge=1), size: int = Query(10, ge=1), cursor: Optional[str] = Query(None)):
     """Retrieve a list of administrative levels one."""
-    count = await AdministrativeLevelOne.all().count()
-    offset = (page - 1) * size
-    _administrative_levels_one = await AdministrativeLevelOne.all().offset(offset).limit(size).values("code", "name", "country__code_iso2")
-    return PaginatedResponse[AdministrativeLevelOneRead](
-        count=count,
+    return await paginate(
+        PaginatedResponse[AdministrativeLevelOneRead],
+        AdministrativeLevelOne,
+        ("code", "name", "country__code_iso2"),
+        size,
         page=page,
-        size=size,
-        data=_administrative_levels_one,
+        cursor=cursor,
+        count_strategy=CountStrategy.CACHED,
     )
 
 
@@ -265,16 +276,16 @@ async def create_administrative_level_one(
 
 
 @router.get("/administrative-levels-twos", response_model=PaginatedResponse[AdministrativeLevelTwoRead], response_model_by_alias=False)
-async def get_administrative_levels_two(page: int = Query(1, ge=1), size: int = Query(10, ge=1)):
+async def get_administrative_levels_two(page: int = Query(1, ge=1), size: int = Query(10, ge=1), cursor: Optional[str] = Query(None)):
     """Retrieve a list of administrative levels two."""
-    count = await AdministrativeLevelTwo.all().count()
-    offset = (page - 1) * size
-    _administrative_levels_two = await AdministrativeLevelTwo.all().offset(offset).limit(size).values("code", "numeric_code", "name", "administrative_level_one__code")
-    return PaginatedResponse[AdministrativeLevelTwoRead](
-        count=count,
+    return await paginate(
+        PaginatedResponse[AdministrativeLevelTwoRead],
+        AdministrativeLevelTwo,
+        ("code", "numeric_code", "name", "administrative_level_one__code"),
+        size,
         page=page,
-        size=size,
-        data=_administrative_levels_two,
+        cursor=cursor,
+        count_strategy=CountStrategy.CACHED,
     )
 
 
@@ -322,11 +333,16 @@ async def create_administrative_level_two(
 
 
 @router.get("/cities", response_model=PaginatedResponse[CityRead], response_model_by_alias=False)
-async def get_cities(page: int = Query(1, ge=1), size: int = Query(10, ge=1)):
-    count = await City.all().count()
-    offset = (page - 1) * size
-    _cities = await City.all().offset(offset).limit(size).values("id", "name", "code_postal", "code_insee", "administrative_level_one__code", "administrative_level_two__code")
-    return PaginatedResponse[CityRead](count=count, page=page, size=size, data=_cities)
+async def get_cities(page: int = Query(1, ge=1), size: int = Query(10, ge=1), cursor: Optional[str] = Query(None)):
+    return await paginate(
+        PaginatedResponse[CityRead],
+        City,
+        ("id", "name", "code_postal", "code_insee", "administrative_level_one__code", "administrative_level_two__code"),
+        size,
+        page=page,
+        cursor=cursor,
+        count_strategy=CountStrategy.CACHED,
+    )
 
 
 @router.get("/cities/{city}")
@@ -396,17 +412,16 @@ async def create_street_type(street_type: StreetTypeCreate):
 
 
 @router.get("/streets", response_model=PaginatedResponse[StreetRead], response_model_by_alias=False)
-async def get_streets(page: int = Query(1, ge=1), size: int = Query(10, ge=1)):
-    """Retrieve a list of streets."""
-    count = await Street.all().count()
-    offset = (page - 1) * size
-
-    _streets = await Street.all().offset(offset).limit(size).values("id", "name", "street_type__code", "city__name")
-    return PaginatedResponse[StreetRead](
-        count=count,
+async def get_streets(page: int = Query(1, ge=1), size: int = Query(10, ge=1), cursor: Optional[str] = Query(None)):
+    """Retrieve a list of streets, by page or by the `next_cursor` of the previous page."""
+    return await paginate(
+        PaginatedResponse[StreetRead],
+        Street,
+        ("id", "name", "street_type__code", "city__name"),
+        size,
         page=page,
-        size=size,
-        data=_streets,
+        cursor=cursor,
+        count_strategy=CountStrategy.ESTIMATED,
     )
 
 
@@ -429,27 +444,81 @@ async def search_addresses(address: Annotated[str, Query(...)]):
     if not address:
         return {"detail": "Address is required", "status_code": status.HTTP_400_BAD_REQUEST}
 
+    _refresh_address_store()
+    if geocoder.loaded:
+        local_address_match = geocoder.search(address)
+        if local_address_match["features"] and local_address_match["features"][0]["properties"]["score"] >= settings.geocoder_local_min_score:
+            return {"result": local_address_match["features"], "is_cached": False, "source": "local"}
+
+        if not settings.geocoder_remote_fallback:
+            return {"message": "searching addresses"}
+
     gov_address_match, is_cached = await Address.search_address_gov(address)
 
-    if gov_address_match:
+    if gov_address_match and gov_address_match.get("features"):
         t = await Address.api_gov_adresse_connector(gov_address_match["features"][0])
         print(t)
-        return {"result": gov_address_match["features"], "is_cached": is_cached}
+        return {"result": gov_address_match["features"], "is_cached": is_cached, "source": "remote"}
 
     return {"message": "searching addresses"}
 
 
+def _refresh_address_store():
+    """Map the address store and its geocoder postings again once buildaddressstore swapped in a new one."""
+    if settings.address_store_enabled and address_store.refresh(settings.store_path, settings.address_store_check_interval):
+        if settings.geocoder_local_enabled:
+            geocoder.open(address_store)
+
+
+def _require_address_store():
+    _refresh_address_store()
+    if not address_store.loaded:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Address store not built, run buildaddressstore")
+
+
+@router.get("/addresses/nearby")
+async def get_addresses_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    radius: float = Query(500, gt=0, le=settings.address_nearby_max_radius, description="Radius in meters."),
+    limit: int = Query(50, ge=1, le=settings.address_query_max_limit),
+):
+    """Retrieve the addresses within `radius` meters of a point, nearest first."""
+    _require_address_store()
+    count, rows = address_store.nearby(lat, lon, radius, limit)
+    return {"count": count, "data": [{**address_store.address(row), "distance": round(distance, 1)} for row, distance in rows]}
+
+
+@router.get("/addresses/bbox")
+async def get_addresses_bbox(
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lon: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lon: float = Query(..., ge=-180, le=180),
+    limit: int = Query(100, ge=1, le=settings.address_query_max_limit),
+):
+    """Retrieve the addresses inside a bounding box, at most `address_bbox_max_span` degrees on each side."""
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid bounding box")
+    if max_lat - min_lat > settings.address_bbox_max_span or max_lon - min_lon > settings.address_bbox_max_span:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Bounding box larger than {settings.address_bbox_max_span} degrees")
+
+    _require_address_store()
+    count, rows = address_store.within(min_lat, min_lon, max_lat, max_lon, limit)
+    return {"count": count, "data": [address_store.address(row) for row in rows]}
+
+
 @router.get("/addresses", response_model=PaginatedResponse[AddressRead], response_model_by_alias=False)
-async def get_addresses(page: int = Query(1, ge=1), size: int = Query(10, ge=1)):
-    """Retrieve a list of addresses."""
-    count = await Address.all().count()
-    offset = (page - 1) * size
-    _addresses = await Address.all().offset(offset).limit(size).values("id", "number", "number_extension", "complement", "latitude", "longitude", "street__name")
-    return PaginatedResponse[AddressRead](
-        count=count,
+async def get_addresses(page: int = Query(1, ge=1), size: int = Query(10, ge=1), cursor: Optional[str] = Query(None)):
+    """Retrieve a list of addresses, by page or by the `next_cursor` of the previous page."""
+    return await paginate(
+        PaginatedResponse[AddressRead],
+        Address,
+        ("id", "number", "number_extension", "complement", "latitude", "longitude", "street__name"),
+        size,
         page=page,
-        size=size,
-        data=_addresses,
+        cursor=cursor,
+        count_strategy=CountStrategy.ESTIMATED,
     )
 
 
@@ -465,16 +534,99 @@ async def create_address(address: AddressCreate):
     return _address
 
 
+@router.get("/reverse")
+async def reverse_geocode(lat: float = Query(..., ge=-90, le=90), lon: float = Query(..., ge=-180, le=180)):
+    """Retrieve the nearest address of a point with its street, city and administrative levels."""
+    _require_address_store()
+    nearest = address_store.nearest(lat, lon, settings.address_reverse_max_distance)
+    if nearest is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No address near this point")
+
+    row, distance = nearest
+    address = address_store.address(row)
+    city = int(address_store.streets["city"][address_store.addresses["street"][row]])
+    return {
+        "address": {key: address[key] for key in ("id", "number", "latitude", "longitude")} | {"distance": round(distance, 1)},
+        "street": address["street"],
+        "city": address["city"],
+        **address_store.administrative_levels(city),
+        "regions": region_index.lookup(lat, lon),
+    }
+
+
+@router.get("/regions/lookup")
+async def lookup_regions(lat: float = Query(..., ge=-90, le=90), lon: float = Query(..., ge=-180, le=180)):
+    """Retrieve the GeoData entities whose geometry contains a point."""
+    return {"data": region_index.lookup(lat, lon)}
+
+
+@router.post("/regions/lookup")
+async def lookup_regions_many(lookup: RegionLookup):
+    """Retrieve the GeoData entities containing each point, in the order of the points."""
+    return {"data": region_index.lookup_many((point.lat, point.lon) for point in lookup.points)}
+
+
+@router.get("/tiles/{z}/{x}/{y}")
+async def get_tile(request: Request, z: int, x: int, y: int):
+    """
+    Retrieve a boundary tile: the GeoData geometries clipped to the tile, in pixels of a 4096 extent.
+
+    Tiles are GeoJSON FeatureCollections with an ETag, answered with 304 when the client has them.
+    """
+    if not 0 <= z <= settings.tiles_max_zoom or not 0 <= x < 2**z or not 0 <= y < 2**z:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tile out of range")
+
+    body = await tile_source.tile(z, x, y)
+    headers = {"ETag": etag(body), "Cache-Control": f"public, max-age={settings.tiles_cache_ttl}"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=body, media_type="application/geo+json", headers=headers)
+
+
+GEO_DATA_FIELDS = ("id", "bbox", *(f"{entity}_id" for entity in GeoData.LINKED_ENTITIES))
+
+
+def _geo_data_summary(row: dict, column: Optional[str] = None) -> dict:
+    """Shape a GeoData row as its id, linked entity and bounding box, plus its geometry when fetched."""
+    linked = next((entity for entity in GeoData.LINKED_ENTITIES if row[f"{entity}_id"] is not None), None)
+    summary = {"id": row["id"], "linked_entity_type": linked, "linked_entity_id": row[f"{linked}_id"] if linked else None, "bbox": row["bbox"]}
+    if column is not None:
+        summary["geojson"] = row[column]
+    return summary
+
+
+async def _stream_geo_data(column: str):
+    """Stream GeoData rows as a JSON array, fetching geometries a batch at a time."""
+    ids = await GeoData.all().order_by("id").values_list("id", flat=True)
+    yield "["
+    for start in range(0, len(ids), settings.geo_data_stream_batch):
+        rows = await GeoData.filter(id__in=ids[start : start + settings.geo_data_stream_batch]).order_by("id").values(*GEO_DATA_FIELDS, column)
+        rows = await GeoData.fill_missing_resolution(rows, column)
+        yield ("," if start else "") + ",".join(json.dumps(_geo_data_summary(row, column), separators=(",", ":")) for row in rows)
+    yield "]"
+
+
 @router.get("/geo-data")
-async def get_geo_data():
-    _geo_data = await GeoData.all()
-    return _geo_data
+async def get_geo_data(geometry: bool = Query(False), resolution: Literal["full", "medium", "low"] = Query("full")):
+    """
+    Retrieve geographical data as ids, linked entities and bounding boxes.
+
+    With `geometry`, each item also carries its geojson at the given resolution; the response is then
+    streamed so the geometries are never all held in memory at once.
+    """
+    if geometry:
+        return StreamingResponse(_stream_geo_data(GeoData.RESOLUTIONS[resolution]), media_type="application/json")
+
+    return [_geo_data_summary(row) for row in await GeoData.all().order_by("id").values(*GEO_DATA_FIELDS)]
 
 
 @router.get("/geo-data/{geo_data}")
-async def get_geo_data_by_id(geo_data: str):
-    _geo_data = await GeoData.get(id=geo_data)
-    return _geo_data
+async def get_geo_data_by_id(geo_data: str, resolution: Literal["full", "medium", "low"] = Query("full")):
+    column = GeoData.RESOLUTIONS[resolution]
+    _geo_data = await GeoData.get(id=geo_data).values(*GEO_DATA_FIELDS, column)
+    (_geo_data,) = await GeoData.fill_missing_resolution([_geo_data], column)
+    return _geo_data_summary(_geo_data, column)
 
 
 # @router.post("/geo-data")
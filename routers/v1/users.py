@@ -18,23 +18,20 @@ from tortoise.expressions import Q
 from models.users import User
 from schemas.pagination import PaginatedResponse
 from schemas.users import UserCreate, UserRead
+from utils.pagination import paginate
 
 router = APIRouter()
 
 
 @router.get("/", response_model=PaginatedResponse[UserRead], response_model_by_alias=False, responses={200: {"description": "List of users"}})
-async def get_users(request: Request, page: int = Query(1, ge=1), size: int = Query(10, ge=1)):
+async def get_users(request: Request, page: int = Query(1, ge=1), size: int = Query(10, ge=1), cursor: Optional[str] = Query(None)):
     """
     Retrieve a list of users, according to filters provided.
     """
-    count = await User.all().count()
-    offset = (page - 1) * size
-
-    _users = (
-        await User.all()
-        .offset(offset)
-        .limit(size)
-        .values(
+    _users = await paginate(
+        PaginatedResponse[UserRead],
+        User,
+        (
             "id",
             "username",
             "email__email",
@@ -48,22 +45,19 @@ async def get_users(request: Request, page: int = Query(1, ge=1), size: int = Qu
             "is_superuser",
             "phone_number__phone_number",
             "phone_number__calling_code__code",
-        )
+        ),
+        size,
+        page=page,
+        cursor=cursor,
     )
 
-    for user in _users:
-        avatar = user.get("avatar")
-        if avatar:
-            user["avatar"] = str(request.url_for("uploads", path=avatar))
+    for user in _users.data:
+        if user.avatar:
+            user.avatar = str(request.url_for("uploads", path=user.avatar))
         else:
-            user["avatar"] = None
+            user.avatar = None
 
-    return PaginatedResponse[UserRead](
-        count=count,
-        page=page,
-        size=size,
-        data=_users,
-    )
+    return _users
 
 
 @router.get("/count")
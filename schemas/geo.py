@@ -249,3 +249,14 @@ class AddressGovAPI(BaseModel):
     type: str = Field(..., description="Type of the ressources in the result.")
     version: str = Field(..., description="Version of the ressources.")
     features: List[AddressGovFeature] = Field(..., description="Features of the ressources.")
+
+
+class Point(BaseModel):
+    lat: float = Field(..., ge=-90, le=90, description="Latitude of the point.")
+    lon: float = Field(..., ge=-180, le=180, description="Longitude of the point.")
+
+
+class RegionLookup(BaseModel):
+    """Schema for looking up the regions of many points."""
+
+    points: List[Point] = Field(..., max_length=1000, description="Points to look up.")
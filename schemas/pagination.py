@@ -1,12 +1,14 @@
-from typing import Generic, List, TypeVar
+from typing import Generic, List, Optional, TypeVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 T = TypeVar("T")
 
 
 class PaginatedResponse(BaseModel, Generic[T]):
     count: int
-    page: int
+    count_strategy: str = Field("exact", description="How the count was produced: exact, cached or estimated.")
+    page: Optional[int] = Field(None, description="Page number, None when paging with a cursor.")
     size: int
+    next_cursor: Optional[str] = Field(None, description="Opaque cursor of the next page, None on the last page.")
     data: List[T]
@@ -0,0 +1,24 @@
+from typing import Any, Type
+
+from tortoise.models import Model
+from tortoise.signals import post_delete, post_save
+
+from models.geo import AdministrativeLevelOne, AdministrativeLevelTwo, City
+from utils.pagination import invalidate_count
+
+
+@post_save(AdministrativeLevelOne, AdministrativeLevelTwo, City)
+async def geo_post_save_count(
+    sender: Type[Model],
+    instance: Model,
+    created: bool,
+    using_db: Any,
+    update_fields: list,
+) -> None:
+    if created:
+        await invalidate_count(sender)
+
+
+@post_delete(AdministrativeLevelOne, AdministrativeLevelTwo, City)
+async def geo_post_delete_count(sender: Type[Model], instance: Model, using_db: Any) -> None:
+    await invalidate_count(sender)
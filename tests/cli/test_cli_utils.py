@@ -0,0 +1,213 @@
+import gzip
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from cli import cli_utils
+from cli.cli_utils import (
+    _init_worker,
+    _worker_state,
+    changed_files,
+    file_sha256,
+    iter_address_chunks,
+    iter_geojson_features,
+    map_address_chunk,
+    run_file_pipeline,
+    run_stage,
+)
+
+BAN_CSV = """id;nom_afnor;numero;rep;code_postal;code_insee;lon;lat
+75102_1;RUE DE LA PAIX;12;;75002;75102;2.331;48.869
+75102_2;RUE DE LA PAIX;12;BIS;75002;75102;2.332;48.870
+75102_3;RUE DE LA PAIX;14;;75002;75102;;
+75102_4;RUE INCONNUE;1;;75002;75102;2.330;48.860
+69381_1;RUE DE LA REPUBLIQUE;3;;69001;69381;4.835;45.765
+"""
+STREETS_BY_NAME = pd.Series({"RUE DE LA PAIX": 1, "RUE DE LA REPUBLIQUE": 2}, dtype="Int64")
+
+
+@pytest.fixture
+def ban_file(tmp_path):
+    """Write a small gzipped BAN address file."""
+    path = tmp_path / "adresses-75.csv.gz"
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        f.write(BAN_CSV)
+    return path
+
+
+def iter_number_chunks(csv_path: Path):
+    """Yield the numbers of a fake file two at a time, failing on the file named "broken"."""
+    if csv_path.name == "broken":
+        raise ValueError("unreadable")
+    size = _worker_state["size"]
+    for start in range(0, size, 2):
+        yield [(csv_path.name, number) for number in range(start, min(start + 2, size))]
+
+
+class TestFilePipeline:
+    """Test suite for the dataset file pipeline."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("workers", [1, 3])
+    async def test_chunks_are_written_in_order(self, workers):
+        """Test every chunk of every file is written in order, then the file finished, a broken file being skipped."""
+        written, finished = {}, []
+
+        async def write(csv_path, index, records):
+            written.setdefault(csv_path.name, []).append((index, records))
+
+        async def finish(csv_path):
+            finished.append(csv_path.name)
+
+        files = [Path(f"file{i}") for i in range(5)] + [Path("broken")]
+        await run_file_pipeline(files, iter_number_chunks, write, {"size": 5}, workers=workers, finish=finish)
+
+        assert sorted(finished) == [f"file{i}" for i in range(5)]
+        assert "broken" not in written
+        for i in range(5):
+            assert [index for index, _ in written[f"file{i}"]] == [0, 1, 2]
+            assert [number for _, records in written[f"file{i}"] for _, number in records] == [0, 1, 2, 3, 4]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("workers", [1, 2])
+    async def test_failed_write_skips_the_file(self, workers):
+        """Test a file whose write fails is not finished, without blocking the others."""
+        finished = []
+
+        async def write(csv_path, index, records):
+            if csv_path.name == "file0" and index == 1:
+                raise RuntimeError("database down")
+
+        async def finish(csv_path):
+            finished.append(csv_path.name)
+
+        files = [Path(f"file{i}") for i in range(4)]
+        await run_file_pipeline(files, iter_number_chunks, write, {"size": 50}, workers=workers, finish=finish)
+        assert sorted(finished) == ["file1", "file2", "file3"]
+
+
+class TestGeoJSONFeatures:
+    """Test suite for the streamed GeoJSON reader."""
+
+    @pytest.mark.parametrize("chunk_size", [4, 64, 1 << 16])
+    def test_features_are_streamed(self, tmp_path, chunk_size):
+        """Test every feature is decoded whatever the read size, including ones larger than the buffer."""
+        features = [{"type": "Feature", "properties": {"code": str(i)}, "geometry": {"type": "Point", "coordinates": [i, i] * (i * 20 + 1)}} for i in range(4)]
+        path = tmp_path / "regions.json"
+        path.write_text(json.dumps({"type": "FeatureCollection", "features": features}, indent=1))
+        assert list(iter_geojson_features(path, chunk_size)) == features
+
+    def test_empty_and_missing_features(self, tmp_path):
+        """Test an empty collection and a file without features yield nothing."""
+        path = tmp_path / "regions.json"
+        path.write_text('{"type": "FeatureCollection", "features": [ ]}')
+        assert list(iter_geojson_features(path, 4)) == []
+        path.write_text('{"type": "FeatureCollection"}')
+        assert list(iter_geojson_features(path, 4)) == []
+
+
+class TestAddressChunks:
+    """Test suite for the chunked address file reader."""
+
+    def test_file_is_read_in_chunks(self, ban_file):
+        """Test a file is mapped `chunksize` rows at a time, the rows of unknown streets left out."""
+        _init_worker({"streets_by_name": STREETS_BY_NAME, "chunksize": 2})
+        chunks = list(iter_address_chunks(ban_file))
+        assert [len(chunk) for chunk in chunks] == [2, 1, 1]
+        assert chunks[0][0] == (1, "12", "", 48.869, 2.331, ban_file.name)
+
+    def test_chunk_mapping(self):
+        """Test streets are resolved by name, repetition indexes normalized, duplicates dropped and missing coordinates kept as None."""
+        chunk = pd.DataFrame(
+            {
+                "nom_afnor": ["RUE DE LA PAIX ", "RUE DE LA PAIX", "RUE DE LA PAIX", "RUE INCONNUE", None, "RUE DE LA PAIX"],
+                "numero": ["12", "12", "14", "1", "2", "12"],
+                "rep": [None, " BIS", None, None, None, "bis"],
+                "code_postal": ["75002"] * 6,
+                "lon": ["2.331", "2.332", "2.333", "2.330", "2.330", "2.339"],
+                "lat": ["48.869", "48.870", "", "48.860", "48.860", "48.879"],
+            }
+        )
+        assert map_address_chunk(chunk, STREETS_BY_NAME, "adresses-75.csv.gz") == [
+            (1, "12", "", 48.869, 2.331, "adresses-75.csv.gz"),
+            (1, "12", "bis", 48.870, 2.332, "adresses-75.csv.gz"),
+            (1, "14", "", None, 2.333, "adresses-75.csv.gz"),
+        ]
+
+    def test_resumed_file_skips_committed_chunks(self, ban_file):
+        """Test the chunks before the resume point are yielded empty, keeping the indexes of the others."""
+        _init_worker({"streets_by_name": STREETS_BY_NAME, "chunksize": 2, "resume_from": {ban_file: 2}})
+        assert [len(chunk) for chunk in iter_address_chunks(ban_file)] == [0, 0, 1]
+
+
+class TestRunStage:
+    """Test suite for the checkpointed dataset stages."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("succeeded", [True, False])
+    async def test_stage_is_done_only_on_success(self, monkeypatch, succeeded):
+        """Test a stage is checkpointed as done only when its loader succeeded, and skipped on resume once done."""
+        checkpoints = {}
+
+        async def load_checkpoints(stage):
+            return checkpoints
+
+        async def save_checkpoint(stage, csv_path=None, chunk=-1, done=False):
+            checkpoints[""] = SimpleNamespace(chunk=chunk, done=done)
+
+        monkeypatch.setattr(cli_utils, "load_checkpoints", load_checkpoints)
+        monkeypatch.setattr(cli_utils, "save_checkpoint", save_checkpoint)
+        calls = []
+
+        async def load():
+            calls.append(True)
+            return succeeded
+
+        await run_stage("cities", load, resume=True)
+        await run_stage("cities", load, resume=True)
+        assert len(calls) == (1 if succeeded else 2)
+        assert ("" in checkpoints) == succeeded
+
+
+class ManifestEntry(SimpleNamespace):
+    """Stand-in for a `DatasetFile` row, recording the fields saved."""
+
+    saved = None
+
+    async def save(self, update_fields):
+        self.saved = update_fields
+
+
+def manifest_entry(path, **changes):
+    stat = path.stat()
+    return ManifestEntry(**{"path": path.name, "size": stat.st_size, "mtime": stat.st_mtime, "sha256": file_sha256(path), **changes})
+
+
+class TestChangedFiles:
+    """Test suite for the dataset file fingerprints."""
+
+    @pytest.mark.asyncio
+    async def test_only_changed_files_are_loaded(self, tmp_path, monkeypatch):
+        """Test files are skipped when their size and mtime, or else their hash, match the manifest."""
+        files = {name: tmp_path / name for name in ("unchanged", "touched", "edited", "new")}
+        for path in files.values():
+            path.write_text("content")
+        manifest = [
+            manifest_entry(files["unchanged"]),
+            manifest_entry(files["touched"], mtime=0.0),
+            manifest_entry(files["edited"], mtime=0.0, sha256="0" * 64),
+        ]
+
+        async def filter(**kwargs):
+            return manifest
+
+        monkeypatch.setattr(cli_utils.DatasetFile, "filter", filter)
+        monkeypatch.setattr(cli_utils, "_manifest_path", lambda path: path.name)
+
+        assert await changed_files("addresses", list(files.values())) == [files["edited"], files["new"]]
+        assert [entry.saved for entry in manifest] == [None, ["mtime"], None]
+        assert manifest[1].mtime == files["touched"].stat().st_mtime
+        assert await changed_files("addresses", list(files.values()), force=True) == list(files.values())
@@ -0,0 +1,49 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils.spatial import GridIndex
+from utils.store import (
+    ADDRESS_COLUMNS,
+    CITY_COLUMNS,
+    STREET_COLUMNS,
+    AddressStore,
+    StringTableWriter,
+)
+
+
+def write_table(path, columns, rows):
+    """Write the columns of a table the way the store builder does."""
+    path.mkdir(parents=True)
+    for column, dtype in columns.items():
+        values = [row.get(column) for row in rows]
+        if dtype == "str":
+            writer = StringTableWriter(path / column, len(values))
+            writer.extend(values)
+            writer.close()
+        else:
+            np.save(path / f"{column}.npy", np.asarray(values, dtype=dtype))
+
+
+@pytest.fixture
+def build_store(tmp_path):
+    """Write and map a store of city, street and address rows, addresses sorted by street."""
+
+    def build(cities, streets, addresses):
+        address_streets = [address["street"] for address in addresses]
+        streets = [{**street, "address_start": int(np.searchsorted(address_streets, i))} for i, street in enumerate(streets)]
+        write_table(tmp_path / "cities", CITY_COLUMNS, cities)
+        write_table(tmp_path / "streets", STREET_COLUMNS, streets)
+        write_table(tmp_path / "addresses", ADDRESS_COLUMNS, addresses)
+
+        lats = np.array([address["latitude"] for address in addresses], dtype=np.float64)
+        lons = np.array([address["longitude"] for address in addresses], dtype=np.float64)
+        GridIndex.build(lats, lons, 0.01).save(tmp_path / "grid")
+        (tmp_path / "meta.json").write_text(json.dumps({"cities": len(cities), "streets": len(streets), "addresses": len(addresses)}))
+
+        store = AddressStore()
+        assert store.open(tmp_path)
+        return store
+
+    return build
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+import valkey
+
+from utils import cache
+from utils.cache import CircuitBreaker, LocalCache
+
+
+class TestCircuitBreaker:
+    """Test suite for the cache circuit breaker."""
+
+    def test_opens_after_threshold(self):
+        """Test the circuit opens after repeated failures and rejects calls."""
+        breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=60)
+        breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+        assert breaker.metrics()["rejected"] == 1
+
+    def test_half_open_probe(self):
+        """Test a single probe is let through after the cool-down and closes the circuit on success."""
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        assert breaker.allow()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow()
+        breaker.record_success()
+        assert breaker.state == CircuitBreaker.CLOSED
+
+    def test_half_open_failure_reopens(self):
+        """Test a failed probe opens the circuit again."""
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=0)
+        for _ in range(3):
+            breaker.record_failure()
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.metrics()["trips"] == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_is_released(self, monkeypatch):
+        """Test a probe cancelled mid-call lets the next call probe instead of rejecting calls forever."""
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        monkeypatch.setattr(cache, "breaker", breaker)
+        monkeypatch.setattr(cache, "get_async_client", lambda: None)
+
+        async def cancelled(client):
+            raise asyncio.CancelledError()
+
+        with pytest.raises(asyncio.CancelledError):
+            await cache._acall(cancelled)
+
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow()
+
+    @pytest.mark.asyncio
+    async def test_command_errors(self, monkeypatch):
+        """Test a valkey error returns None and other errors are raised, neither closing a half-open circuit."""
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+        breaker.record_failure()
+        monkeypatch.setattr(cache, "breaker", breaker)
+        monkeypatch.setattr(cache, "get_async_client", lambda: None)
+
+        async def wrong_type(client):
+            raise valkey.exceptions.ResponseError("WRONGTYPE")
+
+        async def bug(client):
+            raise TypeError("not serializable")
+
+        assert await cache._acall(wrong_type) is None
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        with pytest.raises(TypeError):
+            await cache._acall(bug)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert breaker.allow()
+
+
+class TestLocalCache:
+    """Test suite for the in-process cache tier."""
+
+    def test_read_back(self):
+        """Test a stored value is returned as bytes."""
+        cache = LocalCache(max_entries=10, max_bytes=1024, ttl=60)
+        cache.set("key", "value")
+        assert cache.get("key") == b"value"
+        assert cache.metrics()["hits"] == 1
+
+    def test_evicts_least_recently_used(self):
+        """Test the entry count bound evicts the least recently used entry."""
+        cache = LocalCache(max_entries=2, max_bytes=1024, ttl=60)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+        assert cache.get("b") is None
+        assert cache.get("a") == b"1"
+
+    def test_byte_bound(self):
+        """Test the byte size bound evicts entries and rejects oversized values."""
+        cache = LocalCache(max_entries=10, max_bytes=8, ttl=60)
+        cache.set("a", "1234")
+        cache.set("b", "5678")
+        cache.set("c", "9")
+        assert cache.get("a") is None
+        assert cache.size == 5
+        cache.set("d", "123456789")
+        assert cache.get("d") is None
+
+    def test_expiry(self):
+        """Test an expired entry is not served."""
+        cache = LocalCache(max_entries=10, max_bytes=1024, ttl=60)
+        cache.set("key", "value", ttl=-1)
+        assert cache.get("key") is None
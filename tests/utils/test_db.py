@@ -0,0 +1,56 @@
+from contextlib import asynccontextmanager, nullcontext
+from types import SimpleNamespace
+
+import pytest
+from tortoise import Tortoise
+
+from utils.db import copy_merge
+
+
+class RecordingConnection:
+    """Record the statements and copies of a bulk load, every statement affecting 3 rows."""
+
+    def __init__(self):
+        self.statements = []
+        self.copies = []
+
+    def transaction(self):
+        return nullcontext()
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return "INSERT 0 3"
+
+    async def copy_records_to_table(self, table, records, columns):
+        self.copies.append((table, list(records), columns))
+
+
+class TestCopyMerge:
+    """Test suite for the COPY bulk loader."""
+
+    @pytest.mark.asyncio
+    async def test_merge(self, monkeypatch):
+        """Test rows are copied into a staging table, then merged once per key, unchanged rows left alone."""
+        connection = RecordingConnection()
+
+        class Client:
+            @asynccontextmanager
+            async def acquire_connection(self):
+                yield connection
+
+        monkeypatch.setattr(Tortoise, "get_connection", lambda name: Client())
+        records = [(1, "12", "", 48.869, 2.331), (1, "12", "", 48.87, 2.332)]
+        merged = await copy_merge(
+            SimpleNamespace(_meta=SimpleNamespace(db_table="address")),
+            ("street_id", "number", "number_extension", "latitude", "longitude"),
+            iter(records),
+            conflict_columns=("street_id", "number", "number_extension"),
+            update_columns=("latitude", "longitude"),
+        )
+
+        assert merged == 3
+        assert connection.copies == [("staging_address", records, ["street_id", "number", "number_extension", "latitude", "longitude"])]
+        insert = connection.statements[-1]
+        assert "SELECT DISTINCT ON (street_id, number, number_extension)" in insert and "_position DESC" in insert
+        assert "ON CONFLICT (street_id, number, number_extension) DO UPDATE SET latitude = EXCLUDED.latitude" in insert
+        assert "WHERE (address.latitude, address.longitude) IS DISTINCT FROM (EXCLUDED.latitude, EXCLUDED.longitude)" in insert
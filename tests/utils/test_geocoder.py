@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+import pytest
+
+from utils.geocoder import LocalGeocoder, build_geocoder_index
+from utils.store import AddressStore
+
+CITIES = [
+    ("Paris", "75002", "75102"),
+    ("Lyon", "69001", "69381"),
+    ("Marseille", "13001", "13201"),
+]
+STREETS = [
+    (1, 0, "Rue de la Paix"),
+    (2, 1, "Rue de la République"),
+    (3, 2, "Rue de la Paix Marcel Paul"),
+    (4, 1, "Impasse des Lilas"),
+]
+ADDRESSES = [
+    (100, 0, "12", "", 48.869, 2.331),
+    (101, 0, "12", "bis", 48.870, 2.332),
+    (102, 0, "14", "", 48.871, 2.333),
+    (105, 0, "16", "", np.nan, np.nan),
+    (103, 1, "3", "", 45.765, 4.835),
+    (104, 2, "7", "", 43.297, 5.377),
+    (106, 3, "1", "", np.nan, np.nan),
+]
+
+
+@pytest.fixture
+def address_store(build_store):
+    """Map a store of four streets in three cities, with its geocoder postings."""
+    store = build_store(
+        [{"id": i, "name": name, "code_postal": postcode, "code_insee": citycode} for i, (name, postcode, citycode) in enumerate(CITIES)],
+        [{"id": street_id, "city": city, "name": name} for street_id, city, name in STREETS],
+        [dict(zip(("id", "street", "number", "number_extension", "latitude", "longitude"), address)) for address in ADDRESSES],
+    )
+    build_geocoder_index(store)
+    return store
+
+
+@pytest.fixture
+def local_geocoder(address_store):
+    """Map the geocoder postings of the store."""
+    local_geocoder = LocalGeocoder()
+    assert local_geocoder.open(address_store)
+    return local_geocoder
+
+
+class TestLocalGeocoder:
+    """Test suite for the offline geocoder."""
+
+    def test_housenumber(self, local_geocoder):
+        """Test a query with a house number resolves to that house number."""
+        result = local_geocoder.search("12 rue de la paix paris")
+        best = result["features"][0]
+        assert best["properties"]["type"] == "housenumber"
+        assert best["properties"]["housenumber"] == "12"
+        assert best["properties"]["id"] == "100"
+        assert best["properties"]["street"] == "Rue de la Paix"
+        assert best["properties"]["city"] == "Paris"
+        assert best["geometry"]["coordinates"] == [2.331, 48.869]
+
+    def test_repetition_and_accents(self, local_geocoder):
+        """Test repetition indices and accent-free queries."""
+        assert local_geocoder.search("12 bis Rue De La Paix 75002")["features"][0]["properties"]["housenumber"] == "12bis"
+        assert local_geocoder.search("3 rue de la republique lyon")["features"][0]["properties"]["city"] == "Lyon"
+
+    def test_unknown_number_falls_back_to_street(self, local_geocoder):
+        """Test an unknown house number returns the street at its centroid."""
+        best = local_geocoder.search("99 rue de la paix paris")["features"][0]
+        assert best["properties"]["type"] == "street"
+        assert best["properties"]["postcode"] == "75002"
+        assert best["geometry"]["coordinates"] == pytest.approx([2.332, 48.870])
+
+    def test_addresses_without_location(self, local_geocoder):
+        """Test house numbers and streets without a location are never returned without coordinates."""
+        best = local_geocoder.search("16 rue de la paix paris")["features"][0]
+        assert best["properties"]["type"] == "street"
+        assert best["geometry"]["coordinates"] == pytest.approx([2.332, 48.870])
+
+        result = local_geocoder.search("1 impasse des lilas lyon")
+        assert all(feature["properties"]["street"] != "Impasse des Lilas" for feature in result["features"])
+        json.dumps(result, allow_nan=False)
+
+    def test_open_without_postings(self):
+        """Test a store without geocoder postings leaves the geocoder unloaded."""
+        local_geocoder = LocalGeocoder()
+        assert not local_geocoder.open(AddressStore())
+        assert not local_geocoder.loaded
@@ -0,0 +1,79 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils.http import RetryBudget, create_http_client, get_with_retry
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Stand-in upstream: fails the first `failures` requests with a 503, then answers 200."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        server.requests += 1
+        server.peers.add(self.client_address)
+        status = 503 if server.requests <= server.failures else 200
+        body = b'{"type": "FeatureCollection", "features": []}'
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    """Run the stand-in upstream on a free local port."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.requests = 0
+    server.failures = 0
+    server.peers = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestHttpClient:
+    """Test suite for the shared HTTP client."""
+
+    @pytest.mark.asyncio
+    async def test_keep_alive(self, stand_in):
+        """Test successive requests reuse one pooled connection."""
+        url = f"http://127.0.0.1:{stand_in.server_port}/search/"
+        async with create_http_client() as client:
+            for _ in range(20):
+                response = await get_with_retry(url, params={"q": "paris"}, client=client)
+                assert response.status_code == 200
+
+        assert stand_in.requests == 20
+        assert len(stand_in.peers) == 1
+
+    @pytest.mark.asyncio
+    async def test_retries_server_errors(self, stand_in):
+        """Test a 5xx response is retried."""
+        stand_in.failures = 1
+        url = f"http://127.0.0.1:{stand_in.server_port}/search/"
+        async with create_http_client() as client:
+            response = await get_with_retry(url, client=client, budget=RetryBudget(ratio=0.2, burst=10))
+
+        assert response.status_code == 200
+        assert stand_in.requests == 2
+
+    @pytest.mark.asyncio
+    async def test_retry_budget_exhausted(self, stand_in):
+        """Test no retry is made once the budget is spent."""
+        stand_in.failures = 10
+        url = f"http://127.0.0.1:{stand_in.server_port}/search/"
+        async with create_http_client() as client:
+            response = await get_with_retry(url, client=client, budget=RetryBudget(ratio=0, burst=0))
+
+        assert response.status_code == 503
+        assert stand_in.requests == 1
@@ -0,0 +1,25 @@
+import pytest
+from fastapi import HTTPException
+
+from utils.pagination import decode_cursor, encode_cursor
+
+
+class TestCursor:
+    """Test suite for keyset pagination cursors."""
+
+    def test_cursor_round_trip(self):
+        """Test a cursor decodes back to the values it was built from."""
+        cursor = encode_cursor(("name", "id"), ["Rue de la Paix", 42])
+        assert decode_cursor(cursor, ("name", "id")) == ["Rue de la Paix", 42]
+
+    def test_cursor_ordering_mismatch(self):
+        """Test a cursor built for another ordering is rejected."""
+        cursor = encode_cursor(("id",), [42])
+        with pytest.raises(HTTPException) as exc:
+            decode_cursor(cursor, ("name", "id"))
+        assert exc.value.status_code == 400
+
+    def test_cursor_garbage(self):
+        """Test a malformed cursor is rejected."""
+        with pytest.raises(HTTPException):
+            decode_cursor("not-a-cursor", ("id",))
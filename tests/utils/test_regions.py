@@ -0,0 +1,42 @@
+import numpy as np
+
+from utils.regions import RegionIndex, RTree, parse_polygons, polygon_contains
+
+SQUARE = [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]]
+HOLE = [[4, 4], [6, 4], [6, 6], [4, 6], [4, 4]]
+
+
+class TestRegions:
+    """Test suite for the point-in-polygon lookup."""
+
+    def test_polygon_with_hole(self):
+        """Test a point in a hole is outside the polygon."""
+        (polygon,) = parse_polygons({"type": "Polygon", "coordinates": [SQUARE, HOLE]})
+        assert polygon_contains(polygon, 2, 2)
+        assert not polygon_contains(polygon, 5, 5)
+        assert not polygon_contains(polygon, 11, 5)
+
+    def test_rtree(self):
+        """Test the tree finds exactly the boxes holding a point."""
+        rng = np.random.default_rng(0)
+        corners = rng.uniform(0, 100, (500, 2))
+        boxes = np.hstack([corners, corners + rng.uniform(0, 5, (500, 2))])
+        tree = RTree(boxes, capacity=8)
+        for x, y in rng.uniform(0, 100, (50, 2)):
+            expected = np.flatnonzero((boxes[:, 0] <= x) & (x <= boxes[:, 2]) & (boxes[:, 1] <= y) & (y <= boxes[:, 3]))
+            assert sorted(tree.query(x, y).tolist()) == expected.tolist()
+
+    def test_lookup(self):
+        """Test nested regions are all returned, and rows without geometry or link are skipped."""
+        index = RegionIndex()
+        index.build(
+            [
+                {"id": 1, "administrative_level_one_id": "FR-A", "geojson": {"type": "Feature", "geometry": {"type": "Polygon", "coordinates": [SQUARE]}}},
+                {"id": 2, "administrative_level_two_id": "FR-B", "geojson": {"type": "MultiPolygon", "coordinates": [[HOLE], [[[20, 20], [21, 20], [21, 21], [20, 20]]]]}},
+                {"id": 3, "city_id": 1, "geojson": None},
+                {"id": 4, "geojson": {"type": "Polygon", "coordinates": [SQUARE]}},
+            ]
+        )
+        assert [entry["id"] for entry in index.lookup(5, 5)] in ([1, 2], [2, 1])
+        assert [entry["linked_entity_id"] for entry in index.lookup(1, 1)] == ["FR-A"]
+        assert index.lookup_many([(5, 5), (50, 50)])[1] == []
@@ -0,0 +1,51 @@
+import numpy as np
+
+from utils.simplify import NOT_SHARED, TopologySimplifier, douglas_peucker
+
+
+def feature(coordinates):
+    return {"type": "Feature", "properties": {}, "geometry": {"type": "Polygon", "coordinates": [coordinates]}}
+
+
+class TestSimplify:
+    """Test suite for the geometry simplification."""
+
+    def test_douglas_peucker(self):
+        """Test points closer to the line than the tolerance are dropped, the others kept."""
+        assert douglas_peucker(np.array([[0, 0], [1, 0.01], [2, 0], [3, -0.01], [4, 0]]), 0.1).tolist() == [True, False, False, False, True]
+        assert douglas_peucker(np.array([[0, 0], [1, 1], [2, 0]]), 0.1).tolist() == [True, True, True]
+
+    def test_shared_border(self):
+        """Test a border shared by two polygons is simplified the same in both."""
+        border = [[0.001 * (i % 2), i / 10] for i in range(11)]
+        left = feature([[-1, 0]] + border + [[-1, 1], [-1, 0]])
+        right = feature(border[::-1] + [[1, 0], [1, 1], border[-1]])
+
+        simplifier = TopologySimplifier([left["geometry"], right["geometry"]])
+        simplified_left, simplified_right = simplifier.simplify_feature(left, 0.01), simplifier.simplify_feature(right, 0.01)
+        left_points = {tuple(point) for point in simplified_left["geometry"]["coordinates"][0]}
+        right_points = {tuple(point) for point in simplified_right["geometry"]["coordinates"][0]}
+        shared = {point for point in left_points if point[0] in (0, 0.001)}
+        assert shared == {point for point in right_points if point[0] in (0, 0.001)}
+        assert len(simplified_left["geometry"]["coordinates"][0]) < len(left["geometry"]["coordinates"][0])
+
+    def test_shared_vertices(self):
+        """Test only the vertices of several geometries are indexed, with one owner set id per set."""
+        simplifier = TopologySimplifier()
+        simplifier.add(feature([[0, 0], [1, 0], [1, 1], [0, 1], [0, 0]])["geometry"])
+        simplifier.add(feature([[1, 0], [2, 0], [2, 1], [1, 1], [1, 0]])["geometry"])
+        simplifier.add(feature([[1, 1], [2, 1], [2, 2], [1, 2], [1, 1]])["geometry"])
+        simplifier._index_shared()
+
+        owners = simplifier._owner_sets([(0, 0), (1, 0), (1, 1), (2, 1), (1.0000000001, 0)]).tolist()
+        assert owners[0] == NOT_SHARED
+        assert owners[1] == owners[4] != NOT_SHARED
+        assert len({owners[1], owners[2], owners[3]}) == 3
+        assert len(simplifier.shared_keys) == 3
+
+    def test_collapsed(self):
+        """Test a geometry smaller than the tolerance collapses to None, properties kept."""
+        collapsed = feature([[0, 0], [0.0001, 0], [0.0001, 0.0001], [0, 0]])
+        simplified = TopologySimplifier([collapsed["geometry"]]).simplify_feature(collapsed, 0.01)
+        assert simplified["geometry"] is None
+        assert simplified["properties"] == {}
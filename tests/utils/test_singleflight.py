@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from utils.singleflight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test suite for in-process request coalescing."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_share_one_flight(self):
+        """Test concurrent callers of the same key wait on a single call."""
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"features": []}
+
+        results = await asyncio.gather(*(flight.do("12 rue de la paix", fetch) for _ in range(10)))
+
+        assert calls == 1
+        assert all(result == {"features": []} for result in results)
+        assert len(flight) == 0
+
+    @pytest.mark.asyncio
+    async def test_errors_are_shared_and_forgotten(self):
+        """Test a failed call raises for every waiter and is not kept for the next ones."""
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(flight.do("key", fail), flight.do("key", fail), return_exceptions=True)
+
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert len(flight) == 0
@@ -0,0 +1,31 @@
+import numpy as np
+
+from utils.spatial import GridIndex, haversine, radius_bbox
+
+
+class TestSpatial:
+    """Test suite for the spatial helpers."""
+
+    def test_haversine(self):
+        """Test the distance between Paris and Lyon."""
+        distance = haversine(48.8566, 2.3522, np.array([45.764]), np.array([4.8357]))[0]
+        assert 390_000 < distance < 395_000
+
+    def test_radius_bbox(self):
+        """Test the box of a circle contains the circle."""
+        min_lat, min_lon, max_lat, max_lon = radius_bbox(48.8566, 2.3522, 1000)
+        assert haversine(48.8566, 2.3522, np.array([max_lat, 48.8566]), np.array([2.3522, max_lon]))[0] >= 999
+        assert min_lat < 48.8566 < max_lat and min_lon < 2.3522 < max_lon
+
+    def test_grid_bbox(self):
+        """Test a box query returns every point of the box, and skips points without coordinates."""
+        rng = np.random.default_rng(0)
+        lats = np.append(rng.uniform(43, 49, 5000), np.nan)
+        lons = np.append(rng.uniform(-1, 7, 5000), 2.0)
+        grid = GridIndex.build(lats, lons, 0.05)
+        assert len(grid) == 5000
+
+        candidates = set(grid.bbox(45.0, 2.0, 46.0, 3.5).tolist())
+        inside = np.flatnonzero((lats >= 45.0) & (lats <= 46.0) & (lons >= 2.0) & (lons <= 3.5))
+        assert inside.size and set(inside.tolist()) <= candidates
+        assert 5000 not in candidates
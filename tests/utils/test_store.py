@@ -0,0 +1,194 @@
+import os
+import re
+from contextlib import asynccontextmanager, nullcontext
+
+import numpy as np
+import pytest
+from tortoise import Tortoise
+
+from utils.store import (
+    AddressStore,
+    StringTable,
+    StringTableWriter,
+    build_address_store,
+)
+
+CITIES = [
+    {
+        "id": 10,
+        "name": "Paris",
+        "code_postal": "75002",
+        "code_insee": "75102",
+        "administrative_level_one": "FR-IDF",
+        "administrative_level_one_name": "Île-de-France",
+        "administrative_level_two": "FR-75",
+        "administrative_level_two_name": "Paris",
+    },
+    {
+        "id": 20,
+        "name": "Lyon",
+        "code_postal": "69001",
+        "code_insee": "69381",
+        "administrative_level_one": "FR-ARA",
+        "administrative_level_one_name": "Auvergne-Rhône-Alpes",
+        "administrative_level_two": None,
+        "administrative_level_two_name": None,
+    },
+]
+
+
+class FakeConnection:
+    """Answer the store builder queries from in-memory records, by the first table they select from."""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def _records(self, query):
+        return self.tables[re.search(r"FROM (\w+)", query).group(1)]
+
+    async def fetchval(self, query):
+        return len(self._records(query))
+
+    def transaction(self, **kwargs):
+        return nullcontext()
+
+    async def cursor(self, query):
+        records = list(self._records(query))
+
+        class Cursor:
+            async def fetch(self, size):
+                chunk = records[:size]
+                del records[:size]
+                return chunk
+
+        return Cursor()
+
+
+class FakeClient:
+    def __init__(self, tables):
+        self.connection = FakeConnection(tables)
+
+    @asynccontextmanager
+    async def acquire_connection(self):
+        yield self.connection
+
+
+@pytest.fixture
+def address_store(build_store):
+    """Map a store of two streets in two cities."""
+    return build_store(
+        CITIES,
+        [
+            {"id": 1, "city": 0, "name": "Rue de la Paix"},
+            {"id": 2, "city": 1, "name": "Rue de la République"},
+        ],
+        [
+            {"id": 100, "street": 0, "number": "12", "number_extension": "", "latitude": 48.869, "longitude": 2.331},
+            {"id": 101, "street": 0, "number": "14", "number_extension": "", "latitude": 48.871, "longitude": 2.333},
+            {"id": 102, "street": 1, "number": "3", "number_extension": "", "latitude": 45.765, "longitude": 4.835},
+        ],
+    )
+
+
+class TestAddressStore:
+    """Test suite for the memory-mapped address store."""
+
+    def test_string_table(self, tmp_path):
+        """Test strings written in several chunks read back, empty and non-ASCII ones included."""
+        writer = StringTableWriter(tmp_path / "names", 4)
+        writer.extend(["Rue de la Paix", None])
+        writer.extend(["Rue de la République", ""])
+        writer.close()
+
+        table = StringTable(tmp_path / "names")
+        assert len(table) == 4
+        assert [table[i] for i in range(4)] == ["Rue de la Paix", "", "Rue de la République", ""]
+
+    def test_address(self, address_store):
+        """Test an address row is materialized with its street and city."""
+        address = address_store.address(2)
+        assert address["id"] == 102
+        assert address["number"] == "3"
+        assert address["street"] == {"id": 2, "name": "Rue de la République"}
+        assert address["city"]["name"] == "Lyon"
+        assert address["city"]["code_insee"] == "69381"
+
+    def test_street_addresses(self, address_store):
+        """Test the address rows of each street."""
+        assert list(address_store.street_addresses(0)) == [0, 1]
+        assert list(address_store.street_addresses(1)) == [2]
+
+    def test_nearby(self, address_store):
+        """Test addresses within a radius come nearest first, with their distance."""
+        count, rows = address_store.nearby(48.8691, 2.3311, 500, 10)
+        assert count == 2
+        assert [row for row, _ in rows] == [0, 1]
+        assert rows[0][1] < rows[1][1] < 500
+
+    def test_within(self, address_store):
+        """Test addresses inside a bounding box, limited."""
+        assert address_store.within(48.0, 2.0, 49.0, 3.0, 10) == (2, [0, 1])
+        assert address_store.within(48.0, 2.0, 49.0, 3.0, 1) == (2, [0])
+        assert address_store.within(40.0, 0.0, 41.0, 1.0, 10) == (0, [])
+
+    def test_nearest(self, address_store):
+        """Test the nearest address is found by widening the search, up to the maximum distance."""
+        row, distance = address_store.nearest(45.7651, 4.8351, 2000)
+        assert row == 2 and distance < 50
+        assert address_store.nearest(45.0, 4.0, 2000) is None
+
+    def test_administrative_levels(self, address_store):
+        """Test the administrative levels of a city, missing ones as None."""
+        assert address_store.administrative_levels(0)["administrative_level_two"] == {"code": "FR-75", "name": "Paris"}
+        assert address_store.administrative_levels(1)["administrative_level_two"] is None
+
+    def test_missing(self, tmp_path):
+        """Test opening a directory without a built store."""
+        store = AddressStore()
+        assert not store.open(tmp_path / "missing")
+        assert not store.loaded
+
+    def test_refresh(self, address_store):
+        """Test the store is mapped again once its metadata changed, no more often than the interval."""
+        meta = address_store.path / "meta.json"
+        assert not address_store.refresh(address_store.path, 0)
+
+        os.utime(meta, (address_store.mtime + 10, address_store.mtime + 10))
+        assert not address_store.refresh(address_store.path, 3600)
+        assert address_store.refresh(address_store.path, 0)
+        assert address_store.mtime == meta.stat().st_mtime
+
+    @pytest.mark.asyncio
+    async def test_build_address_store(self, tmp_path, monkeypatch):
+        """Test the tables are streamed in chunks into a store replacing the previous one, with its indexes."""
+        tables = {
+            "city": CITIES,
+            "street": [
+                {"id": 1, "city_id": 10, "name": "Rue de la Paix"},
+                {"id": 2, "city_id": 20, "name": "Rue de la République"},
+                {"id": 3, "city_id": 20, "name": "Impasse des Lilas"},
+            ],
+            "address": [
+                {"id": 100, "street_id": 1, "number": "12", "number_extension": "", "latitude": 48.869, "longitude": 2.331},
+                {"id": 101, "street_id": 1, "number": "12", "number_extension": "bis", "latitude": 48.870, "longitude": 2.332},
+                {"id": 102, "street_id": 3, "number": "3", "number_extension": "", "latitude": None, "longitude": None},
+            ],
+        }
+        monkeypatch.setattr(Tortoise, "get_connection", lambda name: FakeClient(tables))
+        path = tmp_path / "addresses"
+        path.mkdir()
+        (path / "stale").write_text("")
+
+        indexed = []
+        meta = await build_address_store(path, 0.01, indexes=(lambda store: indexed.append(len(store.addresses)),), chunksize=2)
+        assert (meta["cities"], meta["streets"], meta["addresses"]) == (2, 3, 3)
+        assert indexed == [3]
+        assert not (path / "stale").exists()
+
+        store = AddressStore()
+        assert store.open(path)
+        assert [list(store.street_addresses(street)) for street in range(3)] == [[0, 1], [], [2]]
+        assert store.address(1)["number_extension"] == "bis"
+        assert store.address(2)["city"]["name"] == "Lyon"
+        assert np.isnan(store.addresses["latitude"][2])
+        assert store.within(48.0, 2.0, 49.0, 3.0, 10) == (2, [0, 1])
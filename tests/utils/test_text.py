@@ -0,0 +1,14 @@
+from utils.text import normalize_text
+
+
+class TestNormalizeText:
+    """Test suite for text normalization of cache keys and search tokens."""
+
+    def test_variants_fold_together(self):
+        """Test case, spacing and accent variants of a query normalize to the same text."""
+        variants = ["12 rue de la Paix", "12 Rue De La Paix ", "  12  RUE de la paix", "12 rue de la Päix"]
+        assert {normalize_text(variant) for variant in variants} == {"12 rue de la paix"}
+
+    def test_keeps_punctuation(self):
+        """Test punctuation is left for the caller to decide on."""
+        assert normalize_text("Rue de l'Église") == "rue de l'eglise"
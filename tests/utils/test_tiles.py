@@ -0,0 +1,37 @@
+import numpy as np
+
+from utils.regions import RegionIndex
+from utils.tiles import EXTENT, clip_ring, quantize, render_tile, tile_bounds
+
+
+class TestTiles:
+    """Test suite for the boundary tiles."""
+
+    def test_tile_bounds(self):
+        """Test the world tile and one of its children."""
+        min_lon, min_lat, max_lon, max_lat = tile_bounds(0, 0, 0)
+        assert (min_lon, max_lon) == (-180, 180)
+        assert round(max_lat, 4) == 85.0511 and round(min_lat, 4) == -85.0511
+        assert tile_bounds(1, 1, 0)[:2] == (0, 0)
+
+    def test_clip_ring(self):
+        """Test a ring crossing the tile is cut at its edges."""
+        ring = np.array([[-10, -10], [50, -10], [50, 50], [-10, 50], [-10, -10]], dtype=float)
+        clipped = clip_ring(ring, 0, 100)
+        assert clipped.min() == 0 and clipped.max() == 50
+        assert len(clip_ring(ring + 500, 0, 100)) == 0
+        assert quantize(np.array([[0.1, 0.2], [0.4, 0.1], [9.6, 0], [5, 9.8]])) == [[0, 0], [10, 0], [5, 10], [0, 0]]
+
+    def test_render_tile(self):
+        """Test only the geometries crossing the tile are rendered, in tile pixels."""
+        index = RegionIndex()
+        index.build(
+            [
+                {"id": 1, "administrative_level_one_id": "FR-A", "geojson": {"type": "Polygon", "coordinates": [[[1, 1], [2, 1], [2, 2], [1, 2], [1, 1]]]}},
+                {"id": 2, "administrative_level_one_id": "FR-B", "geojson": {"type": "Polygon", "coordinates": [[[-50, -50], [-40, -50], [-40, -40], [-50, -50]]]}},
+            ]
+        )
+        tile = render_tile(index, 1, 1, 0)
+        assert [feature["id"] for feature in tile["features"]] == [1]
+        ring = tile["features"][0]["geometry"]["coordinates"][0][0]
+        assert all(0 <= x <= EXTENT and 0 <= y <= EXTENT for x, y in ring)
@@ -1,28 +1,395 @@
+import asyncio
+import logging
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
 import valkey
+import valkey.asyncio
 
 from config import Settings
 
 settings = Settings()
-redis = valkey.Valkey(host=settings.cache_host, port=settings.cache_port, db=settings.cache_db)
+logger = logging.getLogger("uvicorn")
 
+redis = valkey.Valkey(
+    host=settings.cache_host,
+    port=settings.cache_port,
+    db=settings.cache_db,
+    socket_connect_timeout=settings.cache_socket_timeout,
+    socket_timeout=settings.cache_socket_timeout,
+)
+
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, valkey.asyncio.Valkey]" = weakref.WeakKeyDictionary()
+
+
+class CircuitBreaker:
+    """
+    Stop calling the cache after repeated connection failures.
+
+    After `failure_threshold` failures in a row the circuit opens and every cache call returns None at once.
+    Once `reset_timeout` seconds have passed a single call is let through (half-open): its success closes
+    the circuit, its failure opens it for another cool-down.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Tell whether a call may go through, moving to half-open once the cool-down is over."""
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._probing = False
+
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit {self.name} closed")
+
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(f"Circuit {self.name} opened after {self.failures} failures")
+                self.trips += 1
+
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def record_abort(self):
+        """Forget a call interrupted before its outcome was known, so a half-open circuit can probe again."""
+        self._probing = False
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "rejected": self.rejected,
+        }
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU, the first tier in front of valkey.
+
+    Entries are bounded in count and in total byte size, the least recently used ones are evicted first.
+    Entries live at most `ttl` seconds so a missed invalidation only serves stale data for that long.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            self.pop(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: str, value: Union[str, bytes], ttl: Optional[int] = None):
+        value = value.encode("utf-8") if isinstance(value, str) else value
+        self.pop(key)
+        if len(value) > self.max_bytes:
+            return
+
+        self._entries[key] = (time.monotonic() + min(ttl or self.ttl, self.ttl), value)
+        self.size += len(value)
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def pop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+breaker = CircuitBreaker("cache", settings.cache_breaker_failure_threshold, settings.cache_breaker_reset_timeout)
+local_cache = LocalCache(settings.cache_local_max_entries, settings.cache_local_max_bytes, settings.cache_local_ttl) if settings.cache_local_enabled else None
+instance_id = uuid.uuid4().hex
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Hand a held lock over to a failure marker, kept `ARGV[2]` milliseconds, for the waiters to give up at once.
+FAIL_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("set", KEYS[1], "failed", "PX", ARGV[2])
+end
+return 0
+"""
+LOCK_FAILED = b"failed"
+
+
+def get_async_client() -> valkey.asyncio.Valkey:
+    """
+    Return the asyncio client of the running event loop.
+
+    Pooled connections are bound to the loop that opened them, so each loop (the uvicorn worker, or each
+    `run_async` of the CLI) gets its own pool.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        pool = valkey.asyncio.ConnectionPool(
+            host=settings.cache_host,
+            port=settings.cache_port,
+            db=settings.cache_db,
+            max_connections=settings.cache_max_connections,
+            socket_connect_timeout=settings.cache_socket_timeout,
+            socket_timeout=settings.cache_socket_timeout,
+        )
+        client = _async_clients[loop] = valkey.asyncio.Valkey(connection_pool=pool)
+
+    return client
+
+
+async def close_cache():
+    """Close the connection pool of the running event loop."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose(close_connection_pool=True)
+
+
+async def _acall(command: Callable[[valkey.asyncio.Valkey], Any]):
+    """Run a command on the asyncio client through the circuit breaker, None when valkey fails or is skipped."""
+    if not breaker.allow():
+        return None
 
-def get_from_cache(key: str):
     try:
-        return redis.get(key)
-    except valkey.exceptions.ConnectionError:
+        result = await command(get_async_client())
+    except (valkey.exceptions.ConnectionError, valkey.exceptions.TimeoutError):
+        breaker.record_failure()
         return None
 
-    except Exception as e:
+    except valkey.exceptions.ValkeyError as e:
+        # The server answered with an error: it tells nothing about its availability.
+        logger.warning(f"Cache command failed: {e}")
+        breaker.record_abort()
         return None
 
+    except BaseException:
+        # Cancelled, interrupted or a bug: neither outcome, but a probe must not stay in flight forever.
+        breaker.record_abort()
+        raise
 
-def set_in_cache(key: str, value: str, ttl: int = 60):
-    try:
-        redis.set(key, value)
-        redis.expire(key, ttl)
+    breaker.record_success()
+    return result
 
-    except valkey.exceptions.ConnectionError:
+
+def _call(command: Callable[[valkey.Valkey], Any]):
+    """Run a command on the sync client through the circuit breaker, None when valkey fails or is skipped."""
+    if not breaker.allow():
+        return None
+
+    try:
+        result = command(redis)
+    except (valkey.exceptions.ConnectionError, valkey.exceptions.TimeoutError):
+        breaker.record_failure()
         return None
 
-    except Exception as e:
+    except valkey.exceptions.ValkeyError as e:
+        # The server answered with an error: it tells nothing about its availability.
+        logger.warning(f"Cache command failed: {e}")
+        breaker.record_abort()
         return None
+
+    except BaseException:
+        # Cancelled, interrupted or a bug: neither outcome, but a probe must not stay in flight forever.
+        breaker.record_abort()
+        raise
+
+    breaker.record_success()
+    return result
+
+
+def _invalidation(key: str) -> str:
+    return f"{instance_id}:{key}"
+
+
+async def _awrite(key: str, command: Callable[[Any], Any]):
+    """Run a write on valkey and, with the local tier on, tell the other workers to drop the key."""
+    if local_cache is None:
+        return await _acall(command)
+
+    local_cache.pop(key)
+
+    async def pipelined(client: valkey.asyncio.Valkey):
+        async with client.pipeline(transaction=False) as pipe:
+            command(pipe)
+            pipe.publish(settings.cache_invalidation_channel, _invalidation(key))
+            return (await pipe.execute())[0]
+
+    return await _acall(pipelined)
+
+
+async def listen_for_invalidations():
+    """
+    Evict the local entries written by other processes, for the lifetime of the app.
+
+    When the subscription drops, invalidations may have been missed so the local tier is cleared.
+    """
+    # Dedicated connection: a subscription blocks on reads, the pooled socket timeout does not apply.
+    client = valkey.asyncio.Valkey(host=settings.cache_host, port=settings.cache_port, db=settings.cache_db, socket_connect_timeout=settings.cache_socket_timeout)
+    while True:
+        try:
+            async with client.pubsub() as pubsub:
+                await pubsub.subscribe(settings.cache_invalidation_channel)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+
+                    origin, _, key = message["data"].decode("utf-8").partition(":")
+                    if origin != instance_id:
+                        local_cache.pop(key)
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception as e:
+            logger.warning(f"Cache invalidation listener disconnected: {e}")
+            local_cache.clear()
+            await asyncio.sleep(settings.cache_breaker_reset_timeout)
+
+
+async def aget_from_cache(key: str):
+    if local_cache is not None:
+        value = local_cache.get(key)
+        if value is not None:
+            return value
+
+    value = await _acall(lambda client: client.get(key))
+    if local_cache is not None and value is not None:
+        local_cache.set(key, value)
+
+    return value
+
+
+async def aset_in_cache(key: str, value: str, ttl: int = 60):
+    await _awrite(key, lambda client: client.set(key, value, ex=ttl))
+    if local_cache is not None:
+        local_cache.set(key, value, ttl)
+
+
+async def adelete_from_cache(key: str):
+    await _awrite(key, lambda client: client.delete(key))
+
+
+async def aincr_in_cache(key: str):
+    return await _awrite(key, lambda client: client.incr(key))
+
+
+async def aacquire_lock(key: str, token: str, ttl: float) -> Optional[bool]:
+    """
+    Take a short-lived lock shared by every worker.
+
+    Returns:
+        bool | None: True when acquired, False when held elsewhere, None when the cache is unavailable.
+    """
+
+    async def acquire(client: valkey.asyncio.Valkey):
+        return bool(await client.set(key, token, nx=True, px=int(ttl * 1000)))
+
+    return await _acall(acquire)
+
+
+async def arelease_lock(key: str, token: str):
+    """Release a lock, only if it is still ours and did not expire into someone else's hands."""
+    await _acall(lambda client: client.eval(RELEASE_LOCK_SCRIPT, 1, key, token))
+
+
+async def afail_lock(key: str, token: str, ttl: float):
+    """Release a lock early after the work it guards failed, leaving a failure marker for `ttl` seconds."""
+    await _acall(lambda client: client.eval(FAIL_LOCK_SCRIPT, 1, key, token, int(ttl * 1000)))
+
+
+async def alock_failed(key: str) -> bool:
+    """Tell whether the holder of a lock gave up on the work it guards."""
+    return await _acall(lambda client: client.get(key)) == LOCK_FAILED
+
+
+# Sync wrappers, for the CLI and the Celery tasks which do not run in the API event loop.
+
+
+def get_from_cache(key: str):
+    return _call(lambda client: client.get(key))
+
+
+def _write(key: str, command: Callable[[Any], Any]):
+    if local_cache is None:
+        return _call(command)
+
+    def pipelined(client: valkey.Valkey):
+        with client.pipeline(transaction=False) as pipe:
+            command(pipe)
+            pipe.publish(settings.cache_invalidation_channel, _invalidation(key))
+            return pipe.execute()[0]
+
+    return _call(pipelined)
+
+
+def set_in_cache(key: str, value: str, ttl: int = 60):
+    _write(key, lambda client: client.set(key, value, ex=ttl))
+
+
+def delete_from_cache(key: str):
+    _write(key, lambda client: client.delete(key))
+
+
+def incr_in_cache(key: str):
+    return _write(key, lambda client: client.incr(key))
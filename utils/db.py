@@ -1,6 +1,10 @@
+from typing import Any, Dict, Iterable, List, Sequence, Tuple, Type
+
 import asyncpg
 from config import Settings
+from tortoise import Tortoise
 from tortoise.contrib.fastapi import register_tortoise
+from tortoise.models import Model
 
 settings = Settings()
 
@@ -29,3 +33,164 @@ class Database:
         await conn.execute(f"DROP DATABASE IF EXISTS {settings.db_test_name};")
         await conn.execute(f"CREATE DATABASE {settings.db_test_name};")
         await conn.close()
+
+
+async def copy_merge(
+    model: Type[Model],
+    columns: Sequence[str],
+    records: Iterable[tuple],
+    conflict_columns: Sequence[str],
+    update_columns: Sequence[str] = (),
+) -> int:
+    """
+    Bulk load rows into a model's table through a staging table.
+
+    The rows are streamed with a binary COPY into a temporary table holding only the loaded columns, then
+    merged in a single `INSERT ... SELECT ... ON CONFLICT`: conflicting rows get their `update_columns`
+    overwritten when they differ, or are left as is when there are none. Duplicates within the batch keep
+    their last row.
+
+    Args:
+        model (Model): The target model, its table needs a unique constraint on `conflict_columns`.
+        columns (Sequence[str]): The database columns of the records, in order.
+        records (Iterable[tuple]): The rows to load.
+        conflict_columns (Sequence[str]): The columns identifying a row.
+        update_columns (Sequence[str]): The columns to overwrite on conflict.
+
+    Returns:
+        int: The number of rows inserted or changed.
+    """
+    table = model._meta.db_table
+    staging = f"staging_{table}"
+    column_list = ", ".join(columns)
+    conflict_list = ", ".join(conflict_columns)
+    if update_columns:
+        current = ", ".join(f"{table}.{column}" for column in update_columns)
+        excluded = ", ".join(f"EXCLUDED.{column}" for column in update_columns)
+        # Rows that did not change are not rewritten.
+        on_conflict = "DO UPDATE SET " + ", ".join(f"{column} = EXCLUDED.{column}" for column in update_columns) + f" WHERE ({current}) IS DISTINCT FROM ({excluded})"
+    else:
+        on_conflict = "DO NOTHING"
+
+    client = Tortoise.get_connection("default")
+    async with client.acquire_connection() as connection:
+        async with connection.transaction():
+            await connection.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {column_list} FROM {table} WITH NO DATA")
+            await connection.execute(f"ALTER TABLE {staging} ADD COLUMN _position bigserial")
+            await connection.copy_records_to_table(staging, records=records, columns=list(columns))
+            result = await connection.execute(
+                f"INSERT INTO {table} ({column_list}) "
+                f"SELECT DISTINCT ON ({conflict_list}) {column_list} FROM {staging} ORDER BY {conflict_list}, _position DESC "
+                f"ON CONFLICT ({conflict_list}) {on_conflict}"
+            )
+
+    return int(result.rsplit(" ", 1)[-1])
+
+
+def _kept_table(model: Type[Model]) -> str:
+    return f"kept_{model._meta.db_table}"
+
+
+async def create_kept_table(model: Type[Model], columns: Sequence[str], scope_column: str):
+    """
+    Create the table collecting the keys of the rows to keep, for `prune_missing`.
+
+    It is a regular, logged table: a resumed load does not collect again the keys of the chunks it skips,
+    so they have to survive a crash, which Postgres empties unlogged tables on. Tables created unlogged by
+    earlier loads are switched to logged.
+    """
+    table = model._meta.db_table
+    kept = _kept_table(model)
+    client = Tortoise.get_connection("default")
+    async with client.acquire_connection() as connection:
+        await connection.execute(f"CREATE TABLE IF NOT EXISTS {kept} AS SELECT {scope_column}, {', '.join(columns)} FROM {table} WITH NO DATA")
+        await connection.execute(f"ALTER TABLE {kept} SET LOGGED")
+        await connection.execute(f"CREATE INDEX IF NOT EXISTS {kept}_{scope_column}_idx ON {kept} ({scope_column})")
+
+
+async def copy_kept(model: Type[Model], columns: Sequence[str], records: Iterable[tuple], scope_column: str, scope_value: Any):
+    """Stream the keys of rows to keep in a scope into the kept table with a binary COPY."""
+    client = Tortoise.get_connection("default")
+    async with client.acquire_connection() as connection:
+        await connection.copy_records_to_table(_kept_table(model), records=((scope_value, *record) for record in records), columns=[scope_column, *columns])
+
+
+async def clear_kept(model: Type[Model], scope_column: str, scope_value: Any):
+    """Forget the keys collected for a scope, before collecting them again."""
+    client = Tortoise.get_connection("default")
+    async with client.acquire_connection() as connection:
+        await connection.execute(f"DELETE FROM {_kept_table(model)} WHERE {scope_column} = $1", scope_value)
+
+
+async def prune_missing(model: Type[Model], columns: Sequence[str], scope_column: str, scope_value: Any) -> Tuple[int, int]:
+    """
+    Delete the rows of a model's table that are in a scope but whose keys were not collected as kept.
+
+    The rows whose `scope_column` equals `scope_value` and whose `columns` match no key collected by
+    `copy_kept` for that scope are deleted in one anti-join, then the collected keys are cleared. Keys are
+    compared with `=`, so they should not hold NULLs.
+
+    Args:
+        model (Model): The target model.
+        columns (Sequence[str]): The database columns identifying a row.
+        scope_column (str): The column restricting the deletion.
+        scope_value (Any): The value of `scope_column` of the rows that may be deleted.
+
+    Returns:
+        int: The number of keys kept.
+        int: The number of rows deleted.
+    """
+    table = model._meta.db_table
+    kept = _kept_table(model)
+    matches = " AND ".join(f"{kept}.{column} = {table}.{column}" for column in columns)
+
+    client = Tortoise.get_connection("default")
+    async with client.acquire_connection() as connection:
+        async with connection.transaction():
+            await connection.execute(f"ANALYZE {kept}")
+            result = await connection.execute(
+                f"DELETE FROM {table} WHERE {scope_column} = $1 AND NOT EXISTS (SELECT 1 FROM {kept} WHERE {kept}.{scope_column} = $1 AND {matches})",
+                scope_value,
+            )
+            cleared = await connection.execute(f"DELETE FROM {kept} WHERE {scope_column} = $1", scope_value)
+
+    return int(cleared.rsplit(" ", 1)[-1]), int(result.rsplit(" ", 1)[-1])
+
+
+async def add_missing_columns(connection: asyncpg.Connection, table: str, columns: Dict[str, str]) -> List[str]:
+    """
+    Add the columns of a model a table created before them lacks, `generate_schemas` only creating missing
+    tables.
+
+    Args:
+        connection (asyncpg.Connection): The connection to run the migration on.
+        table (str): The table of the model.
+        columns (Dict[str, str]): The SQL type of each column, as the model declares it.
+
+    Returns:
+        List[str]: The columns added.
+    """
+    existing = {
+        record["column_name"]
+        for record in await connection.fetch("SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = $1", table)
+    }
+    added = [column for column in columns if column not in existing]
+    for column in added:
+        await connection.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {columns[column]}")
+
+    return added
+
+
+async def index_exists(connection: asyncpg.Connection, table: str, columns: Sequence[str], unique: bool = False) -> bool:
+    """Tell whether a table has an index, or a unique one or constraint, on exactly `columns`, in any order."""
+    return bool(
+        await connection.fetchval(
+            "SELECT EXISTS (SELECT 1 FROM pg_index i JOIN pg_class t ON t.oid = i.indrelid "
+            "WHERE t.relname = $1 AND (i.indisunique OR NOT $3) AND i.indpred IS NULL AND ("
+            "SELECT array_agg(a.attname::text ORDER BY a.attname::text) FROM pg_attribute a WHERE a.attrelid = t.oid AND a.attnum = ANY(i.indkey)"
+            ") = $2::text[] AND i.indnatts = cardinality($2::text[]))",
+            table,
+            sorted(columns),
+            unique,
+        )
+    )
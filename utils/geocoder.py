@@ -0,0 +1,197 @@
+import re
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from utils.store import AddressStore, StringTable, StringTableWriter
+from utils.text import normalize_text
+
+_token = re.compile(r"[a-z0-9]+")
+_housenumber = re.compile(r"^\d{1,4}[a-z]?$")
+_digits = re.compile(r"\d+")
+
+# Repetition indices following a house number in BAN ("12 bis", "3 ter", "5 a").
+REPETITIONS = {"bis", "ter", "quater", "quinquies", "a", "b", "c", "d", "e", "f", "g", "h"}
+
+
+def tokenize(value: str) -> List[str]:
+    return _token.findall(normalize_text(value))
+
+
+def build_geocoder_index(store: AddressStore):
+    """
+    Write the token postings of the streets of a store in its `geocoder` directory.
+
+    Each street is indexed by the tokens of its name, city and postal code. The postings are the street
+    rows of every token end to end, sorted by token then street, with the offset of each token in them.
+    """
+    path = store.path / "geocoder"
+    path.mkdir(parents=True, exist_ok=True)
+    vocabulary: Dict[str, int] = {}
+    city_tokens: Dict[int, List[str]] = {}
+    tokens, streets = array("i"), array("i")
+    for street in range(len(store.streets)):
+        city = int(store.streets["city"][street])
+        if city not in city_tokens:
+            city_tokens[city] = tokenize(f"{store.cities['name'][city]} {store.cities['code_postal'][city]}")
+        for token in set(tokenize(store.streets["name"][street]) + city_tokens[city]):
+            tokens.append(vocabulary.setdefault(token, len(vocabulary)))
+            streets.append(street)
+
+    tokens, streets = np.asarray(tokens, dtype=np.int32), np.asarray(streets, dtype=np.int32)
+    counts = np.bincount(tokens, minlength=len(vocabulary))
+    np.save(path / "postings.npy", streets[np.lexsort((streets, tokens))])
+    np.save(path / "offsets.npy", np.r_[0, np.cumsum(counts)].astype(np.int64))
+    np.save(path / "idf.npy", np.log1p(max(len(store.streets), 1) / np.maximum(counts, 1)))
+
+    writer = StringTableWriter(path / "tokens", len(vocabulary))
+    writer.extend(list(vocabulary))
+    writer.close()
+
+
+class LocalGeocoder:
+    """
+    Offline geocoder over the streets and addresses of the address store.
+
+    A query is matched against the postings of its rarest tokens, scored by the share of its token weight
+    (idf) a street covers, then resolved to a house number when the query has one the street knows. Only
+    the token vocabulary lives in the Python heap: the postings are memory-mapped arrays, and the house
+    numbers and coordinates are read from the store.
+    """
+
+    def __init__(self):
+        self.store: Optional[AddressStore] = None
+        self.vocabulary: Dict[str, int] = {}
+        self.postings = np.zeros(0, dtype=np.int32)
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.idf = np.zeros(0, dtype=np.float64)
+        self.max_idf = 1.0
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.vocabulary)
+
+    def open(self, store: AddressStore) -> bool:
+        """Map the postings of a mapped store, returns False when it has none."""
+        path = store.path / "geocoder" if store.path else None
+        if path is None or not (path / "postings.npy").exists():
+            return False
+
+        tokens = StringTable(path / "tokens")
+        self.vocabulary = {tokens[i]: i for i in range(len(tokens))}
+        self.postings = np.load(path / "postings.npy", mmap_mode="r")
+        self.offsets = np.load(path / "offsets.npy", mmap_mode="r")
+        self.idf = np.load(path / "idf.npy")
+        self.max_idf = float(self.idf.max()) if len(self.idf) else 1.0
+        self.store = store
+        return True
+
+    def _postings(self, token: int) -> np.ndarray:
+        return self.postings[self.offsets[token] : self.offsets[token + 1]]
+
+    @staticmethod
+    def parse(query: str) -> Tuple[Optional[str], List[str]]:
+        """Split a query into its house number, if any, and its text tokens."""
+        tokens = tokenize(query)
+        for i, token in enumerate(tokens):
+            if _housenumber.match(token):
+                if i + 1 < len(tokens) and tokens[i + 1] in REPETITIONS:
+                    return f"{token}{tokens[i + 1]}", tokens[:i] + tokens[i + 2 :]
+                return token, tokens[:i] + tokens[i + 1 :]
+
+        return None, tokens
+
+    def search(self, query: str, limit: int = 5) -> Dict[str, Any]:
+        """
+        Geocode a free-text address.
+
+        Returns:
+            dict: A FeatureCollection shaped like the API Adresse responses.
+        """
+        housenumber, tokens = self.parse(query)
+        ids = {token: self.vocabulary[token] for token in set(tokens) if token in self.vocabulary}
+        known = sorted(ids, key=lambda token: len(self._postings(ids[token])))
+        total_weight = sum(float(self.idf[ids[token]]) if token in ids else self.max_idf for token in set(tokens))
+
+        features = []
+        if known:
+            # Candidates come from the two rarest tokens, frequent ones ("rue", "de") only add to their score.
+            # Postings are sorted street rows, so membership is a vectorized binary search rather than a scan.
+            candidates = np.union1d(*(self._postings(ids[token]) for token in (known * 2)[:2]))
+            scores = np.zeros(len(candidates))
+            for token in known:
+                postings = self._postings(ids[token])
+                positions = np.minimum(np.searchsorted(postings, candidates), len(postings) - 1)
+                scores += (postings[positions] == candidates) * float(self.idf[ids[token]])
+
+            for i in np.argsort(-scores, kind="stable")[: limit * 4].tolist():
+                street = int(candidates[i])
+                score = scores[i] / total_weight if total_weight else 0.0
+                matched, row = self.resolve(street, housenumber)
+                feature = self.feature(street, matched, row, 0.9 * score + (0.1 if row is not None else 0.0))
+                if feature is not None:
+                    features.append(feature)
+
+        features.sort(key=lambda feature: feature["properties"]["score"], reverse=True)
+        return {"type": "FeatureCollection", "version": "draft", "features": features[:limit], "query": query}
+
+    def resolve(self, street: int, housenumber: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+        """
+        Find the address row of a house number on a street, falling back from "12bis" to "12". House numbers
+        without a location are left out, the query then falls back to the street.
+        """
+        if not housenumber:
+            return None, None
+
+        addresses = self.store.addresses
+        rows = self.store.street_addresses(street)
+        located = np.isfinite(addresses["latitude"][rows.start : rows.stop]) & np.isfinite(addresses["longitude"][rows.start : rows.stop])
+        rows = (rows.start + np.flatnonzero(located)).tolist()
+        numbers = {f"{addresses['number'][row]}{addresses['number_extension'][row]}".lower().replace(" ", ""): row for row in rows}
+        for candidate in (housenumber, _digits.match(housenumber).group()):
+            if candidate in numbers:
+                return candidate, numbers[candidate]
+
+        return None, None
+
+    def feature(self, street: int, housenumber: Optional[str], row: Optional[int], score: float) -> Optional[Dict[str, Any]]:
+        """The feature of an address row, or of a street without one, None when the street has no location."""
+        store = self.store
+        city = int(store.streets["city"][street])
+        name, postcode, city_name = store.streets["name"][street], store.cities["code_postal"][city], store.cities["name"][city]
+        properties = {
+            "label": f"{name} {postcode} {city_name}",
+            "score": round(score, 4),
+            "id": str(int(store.streets["id"][street])),
+            "name": name,
+            "postcode": postcode,
+            "citycode": store.cities["code_insee"][city],
+            "city": city_name,
+            "street": name,
+            "type": "street",
+        }
+        if row is not None:
+            lon, lat = float(store.addresses["longitude"][row]), float(store.addresses["latitude"][row])
+            properties.update(
+                {
+                    "label": f"{housenumber} {name} {postcode} {city_name}",
+                    "id": str(int(store.addresses["id"][row])),
+                    "name": f"{housenumber} {name}",
+                    "housenumber": housenumber,
+                    "type": "housenumber",
+                }
+            )
+        else:
+            # The street is placed at the centroid of its located house numbers.
+            rows = store.street_addresses(street)
+            lons, lats = store.addresses["longitude"][rows.start : rows.stop], store.addresses["latitude"][rows.start : rows.stop]
+            located = np.isfinite(lons) & np.isfinite(lats)
+            if not located.any():
+                return None
+            lon, lat = float(lons[located].mean()), float(lats[located].mean())
+
+        return {"type": "Feature", "geometry": {"type": "Point", "coordinates": [lon, lat]}, "properties": properties}
+
+
+geocoder = LocalGeocoder()
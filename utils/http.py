@@ -0,0 +1,110 @@
+import asyncio
+from typing import Any, Dict, Optional
+
+import httpx
+
+from config import Settings
+
+settings = Settings()
+
+
+class RetryBudget:
+    """
+    Bound retries to a share of the requests.
+
+    Every request deposits `ratio` tokens and every retry withdraws one, so when an upstream is down the
+    retries add at most `ratio` times the traffic instead of multiplying it. `burst` tokens are available
+    from the start and cap the balance.
+    """
+
+    def __init__(self, ratio: float, burst: int):
+        self.ratio = ratio
+        self.burst = burst
+        self.tokens = float(burst)
+
+    def deposit(self):
+        self.tokens = min(self.burst, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
+
+
+retry_budget = RetryBudget(settings.http_retry_ratio, settings.http_retry_burst)
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create a client with keep-alive connection pooling, limits and timeouts from the settings."""
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.http_timeout, connect=settings.http_connect_timeout),
+        limits=httpx.Limits(
+            max_connections=settings.http_max_connections,
+            max_keepalive_connections=settings.http_max_keepalive_connections,
+            keepalive_expiry=settings.http_keepalive_expiry,
+        ),
+        headers={"User-Agent": f"{settings.app_name}/{settings.app_version}"},
+    )
+
+
+async def open_http_client():
+    """Open the shared client, called in the app lifespan."""
+    global _client
+    _client = create_http_client()
+
+
+async def close_http_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared client, opening it outside of the app lifespan (CLI, tasks)."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_http_client()
+
+    return _client
+
+
+async def get_with_retry(
+    url: str,
+    params: Optional[Dict[str, Any]] = None,
+    client: Optional[httpx.AsyncClient] = None,
+    budget: RetryBudget = retry_budget,
+) -> httpx.Response:
+    """
+    GET a URL, retrying transport errors and 5xx responses with exponential backoff within the retry budget.
+
+    Args:
+        url (str): The URL.
+        params (dict, optional): The query parameters.
+        client (httpx.AsyncClient, optional): The client, the shared one by default.
+        budget (RetryBudget): The retry budget.
+
+    Returns:
+        httpx.Response: The last response.
+
+    Raises:
+        httpx.TransportError: When the last attempt failed at the transport level.
+    """
+    client = client or get_http_client()
+    budget.deposit()
+
+    for attempt in range(settings.http_max_retries + 1):
+        last_attempt = attempt == settings.http_max_retries
+        try:
+            response = await client.get(url, params=params)
+            if response.status_code < 500 or last_attempt or not budget.withdraw():
+                return response
+
+        except httpx.TransportError:
+            if last_attempt or not budget.withdraw():
+                raise
+
+        await asyncio.sleep(settings.http_retry_backoff * 2**attempt)
@@ -0,0 +1,225 @@
+import asyncio
+import base64
+import json
+from enum import Enum
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi import HTTPException, status
+from tortoise import Tortoise
+from tortoise.expressions import Q
+from tortoise.models import Model
+from tortoise.queryset import QuerySet
+
+from config import Settings
+from schemas.pagination import PaginatedResponse
+from utils.cache import adelete_from_cache, aget_from_cache, aset_in_cache
+
+settings = Settings()
+
+
+class CountStrategy(str, Enum):
+    EXACT = "exact"
+    CACHED = "cached"
+    ESTIMATED = "estimated"
+
+
+def count_cache_key(model: Type[Model]) -> str:
+    return f"count:{model._meta.db_table}"
+
+
+async def invalidate_count(model: Type[Model]):
+    """Drop the cached row count of a model, called on writes."""
+    await adelete_from_cache(count_cache_key(model))
+
+
+async def estimate_count(model: Type[Model]) -> Optional[int]:
+    """
+    Read the planner's row estimate of a table from `pg_class.reltuples`.
+
+    Returns:
+        int | None: The estimate, None when the table was never analyzed.
+    """
+    connection = Tortoise.get_connection("default")
+    rows = await connection.execute_query_dict("SELECT reltuples::bigint AS estimate FROM pg_class WHERE oid = to_regclass($1)", [model._meta.db_table])
+    if not rows or rows[0]["estimate"] is None or rows[0]["estimate"] < 0:
+        return None
+
+    return rows[0]["estimate"]
+
+
+async def count_rows(model: Type[Model], strategy: CountStrategy = CountStrategy.EXACT) -> Tuple[int, CountStrategy]:
+    """
+    Count the rows of a model's table with the given strategy.
+
+    `cached` keeps the exact count in the cache for `cache_count_ttl` seconds and is dropped on writes,
+    `estimated` trusts the statistics of the last ANALYZE. Both fall back to an exact count when they
+    have nothing to offer.
+
+    Args:
+        model (Model): The model to count.
+        strategy (CountStrategy): The count strategy.
+
+    Returns:
+        int: The row count.
+        CountStrategy: The strategy that actually produced the count.
+    """
+    if strategy == CountStrategy.ESTIMATED:
+        estimate = await estimate_count(model)
+        if estimate is not None:
+            return estimate, CountStrategy.ESTIMATED
+
+    elif strategy == CountStrategy.CACHED:
+        cached_count = await aget_from_cache(count_cache_key(model))
+        if cached_count is not None:
+            return int(cached_count), CountStrategy.CACHED
+
+        count = await model.all().count()
+        await aset_in_cache(count_cache_key(model), str(count), settings.cache_count_ttl)
+        return count, CountStrategy.EXACT
+
+    return await model.all().count(), CountStrategy.EXACT
+
+
+def encode_cursor(ordering: Sequence[str], values: Sequence[Any]) -> str:
+    """
+    Encode the ordering and the key values of the last row of a page into an opaque cursor.
+
+    Args:
+        ordering (Sequence[str]): The ordering columns, prefixed with "-" when descending.
+        values (Sequence[Any]): The values of the ordering columns for the last row.
+
+    Returns:
+        str: A URL-safe cursor.
+    """
+    payload = json.dumps({"o": list(ordering), "v": list(values)}, default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, ordering: Sequence[str]) -> List[Any]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (str): The opaque cursor sent by the client.
+        ordering (Sequence[str]): The ordering the endpoint pages on.
+
+    Returns:
+        list: The key values of the last row of the previous page.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = payload["v"]
+        if payload["o"] != list(ordering) or len(values) != len(ordering):
+            raise ValueError("Cursor ordering mismatch")
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+    return values
+
+
+def keyset_filter(ordering: Sequence[str], values: Sequence[Any]) -> Q:
+    """
+    Build the "rows after this key" filter for a keyset page.
+
+    For an ordering (a, b, id) this is `a > x OR (a = x AND b > y) OR (a = x AND b = y AND id > z)`,
+    which an index on the ordering columns can seek directly instead of scanning skipped rows.
+    """
+    clauses = []
+    for i, column in enumerate(ordering):
+        name = column.lstrip("-")
+        operator = "lt" if column.startswith("-") else "gt"
+        equalities = {prev.lstrip("-"): value for prev, value in zip(ordering[:i], values[:i])}
+        clauses.append(Q(**equalities, **{f"{name}__{operator}": values[i]}))
+
+    return Q(*clauses, join_type=Q.OR)
+
+
+async def paginate_queryset(
+    queryset: QuerySet,
+    fields: Sequence[str],
+    size: int,
+    page: Optional[int] = 1,
+    cursor: Optional[str] = None,
+    ordering: Optional[Sequence[str]] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Fetch one page of a queryset, either by offset or by keyset cursor.
+
+    The ordering must be unique (end it with the primary key) and backed by an index for keyset pages
+    to cost the same whatever their depth. Offset paging is kept for small tables and random access.
+
+    Args:
+        queryset (QuerySet): The base queryset.
+        fields (Sequence[str]): The fields to fetch with `.values()`.
+        size (int): The page size.
+        page (int, optional): The page number, ignored when a cursor is given.
+        cursor (str, optional): The cursor returned as `next_cursor` by the previous page.
+        ordering (Sequence[str], optional): The ordering columns, defaults to the primary key.
+
+    Returns:
+        list: The page rows.
+        str | None: The cursor of the next page, None on the last page.
+    """
+    ordering = ordering or (queryset.model._meta.pk_attr,)
+    keys = [column.lstrip("-") for column in ordering]
+    queryset = queryset.order_by(*ordering)
+
+    if cursor:
+        queryset = queryset.filter(keyset_filter(ordering, decode_cursor(cursor, ordering)))
+    else:
+        queryset = queryset.offset((page - 1) * size)
+
+    values = list(fields) + [key for key in keys if key not in fields]
+    rows = await queryset.limit(size + 1).values(*values)
+
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        next_cursor = encode_cursor(ordering, [rows[-1][key] for key in keys])
+
+    return rows, next_cursor
+
+
+async def paginate(
+    schema: Type[PaginatedResponse],
+    model: Type[Model],
+    fields: Sequence[str],
+    size: int,
+    page: Optional[int] = 1,
+    cursor: Optional[str] = None,
+    count_strategy: CountStrategy = CountStrategy.EXACT,
+    ordering: Optional[Sequence[str]] = None,
+) -> PaginatedResponse:
+    """
+    Build a paginated listing of a model.
+
+    The count and the page are awaited together: outside of a transaction each query acquires its own
+    connection from the pool, so a listing costs one round trip instead of two in a row.
+
+    Args:
+        schema (PaginatedResponse): The parametrized response, e.g. `PaginatedResponse[CityRead]`.
+        model (Model): The listed model.
+        fields (Sequence[str]): The fields to fetch with `.values()`.
+        size (int): The page size.
+        page (int, optional): The page number, ignored when a cursor is given.
+        cursor (str, optional): The cursor returned as `next_cursor` by the previous page.
+        count_strategy (CountStrategy): How to count the rows of the model.
+        ordering (Sequence[str], optional): The ordering columns, defaults to the primary key.
+
+    Returns:
+        PaginatedResponse: The page.
+    """
+    (count, strategy), (rows, next_cursor) = await asyncio.gather(
+        count_rows(model, count_strategy),
+        paginate_queryset(model.all(), fields, size, page=page, cursor=cursor, ordering=ordering),
+    )
+
+    return schema(
+        count=count,
+        count_strategy=strategy.value,
+        page=None if cursor else page,
+        size=size,
+        next_cursor=next_cursor,
+        data=rows,
+    )
@@ -0,0 +1,114 @@
+import asyncio
+import time
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from tortoise.exceptions import DoesNotExist
+from tortoise.models import Model
+
+from config import Settings
+from models.geo import (
+    CallingCode,
+    Continent,
+    Country,
+    Currency,
+    Language,
+    TopLevelDomain,
+)
+from utils.cache import aget_from_cache, aincr_in_cache
+from utils.pagination import decode_cursor, encode_cursor
+
+settings = Settings()
+
+
+class Snapshot:
+    """Rows of one reference table, sorted by primary key."""
+
+    def __init__(self, rows: List[Dict[str, Any]], pk: str, version: Optional[bytes]):
+        self.rows = rows
+        self.pks = [row[pk] for row in rows]
+        self.by_pk = dict(zip(self.pks, rows))
+        self.version = version
+        self.checked_at = time.monotonic()
+
+
+class ReferenceData:
+    """
+    In-process snapshot of the reference tables, which almost never change.
+
+    Writers bump a per-table version in the cache through `invalidate`, readers compare it at most every
+    `reference_data_check_interval` seconds and reload the table when it moved, so every worker and the
+    CLI converge without hitting Postgres on each lookup.
+    """
+
+    models: Tuple[Type[Model], ...] = (Language, Currency, Continent, Country, CallingCode, TopLevelDomain)
+
+    def __init__(self):
+        self._snapshots: Dict[str, Snapshot] = {}
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def version_key(model: Type[Model]) -> str:
+        return f"reference:version:{model._meta.db_table}"
+
+    async def load(self, *models: Type[Model]):
+        """Load (or reload) the snapshot of the given models, all reference models by default."""
+        for model in models or self.models:
+            version = await aget_from_cache(self.version_key(model))
+            rows = await model.all().order_by(model._meta.pk_attr).values()
+            self._snapshots[model._meta.db_table] = Snapshot(rows, model._meta.pk_attr, version)
+
+    async def invalidate(self, model: Type[Model]):
+        """Signal a write to a reference table to every process, and reload it locally."""
+        await aincr_in_cache(self.version_key(model))
+        async with self._lock:
+            await self.load(model)
+
+    async def snapshot(self, model: Type[Model]) -> Snapshot:
+        _snapshot = self._snapshots.get(model._meta.db_table)
+        if _snapshot and time.monotonic() - _snapshot.checked_at < settings.reference_data_check_interval:
+            return _snapshot
+
+        async with self._lock:
+            _snapshot = self._snapshots.get(model._meta.db_table)
+            if _snapshot is None or await aget_from_cache(self.version_key(model)) != _snapshot.version:
+                await self.load(model)
+            else:
+                _snapshot.checked_at = time.monotonic()
+
+        return self._snapshots[model._meta.db_table]
+
+    async def all(self, model: Type[Model]) -> List[Dict[str, Any]]:
+        return (await self.snapshot(model)).rows
+
+    async def get(self, model: Type[Model], pk: Any) -> Dict[str, Any]:
+        """Get a row by primary key, raising DoesNotExist like `Model.get` does."""
+        row = (await self.snapshot(model)).by_pk.get(pk)
+        if row is None:
+            raise DoesNotExist(model)
+
+        return row
+
+    async def page(self, model: Type[Model], size: int, page: Optional[int] = 1, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Slice a page out of the snapshot, by offset or by cursor, like `paginate_queryset` does.
+
+        Returns:
+            list: The page rows.
+            str | None: The cursor of the next page, None on the last page.
+        """
+        _snapshot = await self.snapshot(model)
+        ordering: Sequence[str] = (model._meta.pk_attr,)
+
+        if cursor:
+            start = bisect_right(_snapshot.pks, decode_cursor(cursor, ordering)[0])
+        else:
+            start = (page - 1) * size
+
+        rows = _snapshot.rows[start : start + size]
+        next_cursor = encode_cursor(ordering, [rows[-1][ordering[0]]]) if rows and start + size < len(_snapshot.rows) else None
+
+        return rows, next_cursor
+
+
+reference_data = ReferenceData()
@@ -0,0 +1,172 @@
+import math
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from models.geo import GeoData
+
+LINKED_ENTITIES = GeoData.LINKED_ENTITIES
+
+# A polygon is its outer ring followed by its holes, each an (n, 2) array of lon, lat.
+Polygon = List[np.ndarray]
+
+
+def parse_polygons(geojson: Dict[str, Any]) -> List[Polygon]:
+    """Extract the polygons of a GeoJSON Feature or geometry, other geometry types yield none."""
+    geometry = geojson.get("geometry", geojson) if geojson.get("type") == "Feature" else geojson
+    if not geometry:
+        return []
+
+    if geometry.get("type") == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry.get("type") == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    elif geometry.get("type") == "GeometryCollection":
+        return [polygon for part in geometry.get("geometries", []) for polygon in parse_polygons(part)]
+    else:
+        return []
+
+    return [[np.asarray(ring, dtype=np.float64)[:, :2] for ring in polygon] for polygon in polygons if polygon]
+
+
+def ring_contains(ring: np.ndarray, x: float, y: float) -> bool:
+    """Even-odd ray casting of a point against a ring, vectorized over its edges."""
+    xi, yi = ring[:, 0], ring[:, 1]
+    xj, yj = np.roll(xi, 1), np.roll(yi, 1)
+    straddles = (yi > y) != (yj > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crossings = straddles & (x < (xj - xi) * (y - yi) / (yj - yi) + xi)
+    return bool(np.count_nonzero(crossings) % 2)
+
+
+def polygon_contains(polygon: Polygon, x: float, y: float) -> bool:
+    return ring_contains(polygon[0], x, y) and not any(ring_contains(hole, x, y) for hole in polygon[1:])
+
+
+def bounds(polygons: Sequence[Polygon]) -> Tuple[float, float, float, float]:
+    rings = [polygon[0] for polygon in polygons]
+    return (
+        min(float(ring[:, 0].min()) for ring in rings),
+        min(float(ring[:, 1].min()) for ring in rings),
+        max(float(ring[:, 0].max()) for ring in rings),
+        max(float(ring[:, 1].max()) for ring in rings),
+    )
+
+
+def _box_contains(boxes: np.ndarray, x: float, y: float) -> np.ndarray:
+    return (boxes[:, 0] <= x) & (x <= boxes[:, 2]) & (boxes[:, 1] <= y) & (y <= boxes[:, 3])
+
+
+def _box_intersects(boxes: np.ndarray, box: Sequence[float]) -> np.ndarray:
+    return (boxes[:, 0] <= box[2]) & (box[0] <= boxes[:, 2]) & (boxes[:, 1] <= box[3]) & (box[1] <= boxes[:, 3])
+
+
+class RTree:
+    """
+    Static R-tree over bounding boxes, bulk loaded with Sort-Tile-Recursive packing.
+
+    Boxes are sorted into vertical slices by their center x, each slice by center y, then grouped
+    `capacity` at a time into nodes; the nodes are packed the same way up to a single root. A point query
+    only descends into the nodes whose box holds the point.
+    """
+
+    def __init__(self, boxes: Sequence[Sequence[float]], capacity: int = 16):
+        self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        self.capacity = capacity
+        # Levels from the leaves up, each the boxes of its nodes and the children of each node.
+        self.levels: List[Tuple[np.ndarray, List[np.ndarray]]] = []
+
+        entries = self.boxes
+        while len(entries):
+            groups = self._pack(entries)
+            nodes = np.array([[entries[g, 0].min(), entries[g, 1].min(), entries[g, 2].max(), entries[g, 3].max()] for g in groups])
+            self.levels.append((nodes, groups))
+            if len(groups) == 1:
+                break
+            entries = nodes
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def _pack(self, boxes: np.ndarray) -> List[np.ndarray]:
+        leaves = math.ceil(len(boxes) / self.capacity)
+        slice_size = math.ceil(math.sqrt(leaves)) * self.capacity
+        centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+
+        groups = []
+        by_x = np.argsort(centers[:, 0], kind="stable")
+        for start in range(0, len(boxes), slice_size):
+            tile = by_x[start : start + slice_size]
+            tile = tile[np.argsort(centers[tile, 1], kind="stable")]
+            groups.extend(tile[i : i + self.capacity] for i in range(0, len(tile), self.capacity))
+
+        return groups
+
+    def _search(self, matches) -> np.ndarray:
+        if not self.levels:
+            return np.zeros(0, dtype=np.int64)
+
+        nodes = np.arange(len(self.levels[-1][0]))
+        for boxes, groups in reversed(self.levels):
+            nodes = nodes[matches(boxes[nodes])]
+            if not len(nodes):
+                return np.zeros(0, dtype=np.int64)
+            nodes = np.concatenate([groups[node] for node in nodes])
+
+        return nodes[matches(self.boxes[nodes])]
+
+    def query(self, x: float, y: float) -> np.ndarray:
+        """Indices of the boxes holding a point."""
+        return self._search(lambda boxes: _box_contains(boxes, x, y))
+
+    def query_box(self, box: Sequence[float]) -> np.ndarray:
+        """Indices of the boxes intersecting a (min_x, min_y, max_x, max_y) box."""
+        return self._search(lambda boxes: _box_intersects(boxes, box))
+
+
+class RegionIndex:
+    """
+    Point-in-polygon lookup over the GeoData geometries.
+
+    Geometries are parsed once, when the index is loaded. The R-tree of their bounding boxes narrows a
+    point down to a few candidates, and only those get the exact ring tests.
+    """
+
+    def __init__(self):
+        self.entries: List[Dict[str, Any]] = []
+        self.polygons: List[List[Polygon]] = []
+        self.tree = RTree([])
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.entries)
+
+    def build(self, rows: Iterable[Dict[str, Any]]):
+        """Index GeoData rows fetched with their `geojson` and linked entity ids."""
+        entries, polygons = [], []
+        for row in rows:
+            parsed = parse_polygons(row.get("geojson") or {})
+            linked = next((entity for entity in LINKED_ENTITIES if row.get(f"{entity}_id") is not None), None)
+            if not parsed or linked is None:
+                continue
+
+            entries.append({"id": row["id"], "linked_entity_type": linked, "linked_entity_id": row[f"{linked}_id"]})
+            polygons.append(parsed)
+
+        self.tree = RTree([bounds(parsed) for parsed in polygons])
+        self.entries, self.polygons = entries, polygons
+
+    async def load(self):
+        rows = await GeoData.all().values("id", "geojson", *(f"{entity}_id" for entity in LINKED_ENTITIES))
+        self.build(rows)
+
+    def lookup(self, lat: float, lon: float) -> List[Dict[str, Any]]:
+        """The GeoData entities whose geometry contains a point."""
+        return [self.entries[i] for i in self.tree.query(lon, lat).tolist() if any(polygon_contains(polygon, lon, lat) for polygon in self.polygons[i])]
+
+    def lookup_many(self, points: Iterable[Tuple[float, float]]) -> List[List[Dict[str, Any]]]:
+        """Look up many (lat, lon) points in one call."""
+        return [self.lookup(lat, lon) for lat, lon in points]
+
+
+region_index = RegionIndex()
@@ -0,0 +1,81 @@
+import math
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+EARTH_RADIUS = 6_371_008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS / 180
+
+
+def haversine(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Distance in meters from a point to arrays of points."""
+    lat1, lon1 = math.radians(lat), math.radians(lon)
+    lat2, lon2 = np.radians(lats), np.radians(lons)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def radius_bbox(lat: float, lon: float, radius: float) -> Tuple[float, float, float, float]:
+    """Bounding box (min_lat, min_lon, max_lat, max_lon) of a circle of `radius` meters."""
+    dlat = radius / METERS_PER_DEGREE
+    dlon = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+    return max(lat - dlat, -90.0), max(lon - dlon, -180.0), min(lat + dlat, 90.0), min(lon + dlon, 180.0)
+
+
+class GridIndex:
+    """
+    Fixed grid over latitude and longitude, for bounding-box queries on millions of points.
+
+    Each point gets the key of its cell, `row * columns + column`, and the points are sorted by key. The
+    cells of one grid row covering a box are then consecutive keys, hence one contiguous slice of the
+    sorted points found by two binary searches: a box query costs one slice per grid row it spans.
+    """
+
+    def __init__(self, keys: np.ndarray, order: np.ndarray, cell: float):
+        self.keys = keys
+        self.order = order
+        self.cell = cell
+        self.columns = math.ceil(360 / cell) + 1
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    @staticmethod
+    def cell_keys(lats: np.ndarray, lons: np.ndarray, cell: float) -> np.ndarray:
+        columns = math.ceil(360 / cell) + 1
+        rows = np.floor((np.asarray(lats) + 90) / cell).astype(np.int64)
+        return rows * columns + np.floor((np.asarray(lons) + 180) / cell).astype(np.int64)
+
+    @classmethod
+    def build(cls, lats: np.ndarray, lons: np.ndarray, cell: float) -> "GridIndex":
+        """Index the points with coordinates, the others are left out."""
+        located = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+        keys = cls.cell_keys(lats[located], lons[located], cell)
+        order = np.argsort(keys, kind="stable")
+        return cls(keys[order], located[order].astype(np.int64), cell)
+
+    def save(self, path: Path):
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "keys.npy", self.keys)
+        np.save(path / "order.npy", self.order)
+        np.save(path / "cell.npy", np.asarray([self.cell]))
+
+    @classmethod
+    def open(cls, path: Path) -> "GridIndex":
+        """Map a saved index without reading it into memory."""
+        return cls(np.load(path / "keys.npy", mmap_mode="r"), np.load(path / "order.npy", mmap_mode="r"), float(np.load(path / "cell.npy")[0]))
+
+    def bbox(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> np.ndarray:
+        """Rows of the points in the cells overlapping a box, a superset of the points in the box."""
+        first_row, last_row = self.cell_keys([min_lat, max_lat], [min_lon, min_lon], self.cell) // self.columns
+        first_column, last_column = self.cell_keys([min_lat, min_lat], [min_lon, max_lon], self.cell) % self.columns
+
+        slices = []
+        for row in range(int(first_row), int(last_row) + 1):
+            start = np.searchsorted(self.keys, row * self.columns + first_column, side="left")
+            end = np.searchsorted(self.keys, row * self.columns + last_column, side="right")
+            if end > start:
+                slices.append(self.order[start:end])
+
+        return np.concatenate(slices) if slices else np.zeros(0, dtype=np.int64)
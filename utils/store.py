@@ -0,0 +1,364 @@
+import json
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from tortoise import Tortoise
+
+from utils.spatial import METERS_PER_DEGREE, GridIndex, haversine, radius_bbox
+
+# Column layout of the store: name -> dtype, "str" columns are string tables.
+CITY_COLUMNS = {
+    "id": np.int64,
+    "name": "str",
+    "code_postal": "str",
+    "code_insee": "str",
+    "administrative_level_one": "str",
+    "administrative_level_one_name": "str",
+    "administrative_level_two": "str",
+    "administrative_level_two_name": "str",
+}
+STREET_COLUMNS = {"id": np.int64, "city": np.int32, "name": "str", "address_start": np.int64}
+ADDRESS_COLUMNS = {"id": np.int64, "street": np.int32, "number": "str", "number_extension": "str", "latitude": np.float64, "longitude": np.float64}
+
+
+class StringTable:
+    """
+    Read-only column of strings over two memory-mapped files: the utf-8 bytes of every value end to end,
+    and the offsets of each value in them.
+    """
+
+    def __init__(self, path: Path):
+        self.offsets = np.load(path.with_suffix(".offsets.npy"), mmap_mode="r")
+        self.blob = np.memmap(path.with_suffix(".bin"), dtype=np.uint8, mode="r") if self.offsets[-1] else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self.blob[self.offsets[index] : self.offsets[index + 1]].tobytes().decode("utf-8")
+
+
+class StringTableWriter:
+    def __init__(self, path: Path, length: int):
+        self.offsets = np.lib.format.open_memmap(path.with_suffix(".offsets.npy"), mode="w+", dtype=np.int64, shape=(length + 1,))
+        self.offsets[0] = 0
+        self.blob = open(path.with_suffix(".bin"), "wb")
+        self.position = 0
+        self.size = 0
+
+    def extend(self, values: Sequence[Optional[str]]):
+        encoded = [(value or "").encode("utf-8") for value in values]
+        lengths = np.fromiter((len(value) for value in encoded), dtype=np.int64, count=len(encoded))
+        self.offsets[self.position + 1 : self.position + 1 + len(encoded)] = self.size + np.cumsum(lengths)
+        self.blob.write(b"".join(encoded))
+        self.position += len(encoded)
+        self.size += int(lengths.sum())
+
+    def close(self):
+        self.offsets.flush()
+        self.blob.close()
+
+
+class ColumnWriter:
+    """Numeric column being written, filled in order like a `StringTableWriter`."""
+
+    def __init__(self, path: Path, dtype: Any, length: int):
+        self.values = np.lib.format.open_memmap(path.with_suffix(".npy"), mode="w+", dtype=dtype, shape=(length,))
+        self.position = 0
+
+    def extend(self, values: Sequence[Any]):
+        self.values[self.position : self.position + len(values)] = np.asarray(values, dtype=self.values.dtype)
+        self.position += len(values)
+
+    def close(self):
+        self.values.flush()
+
+
+class Table:
+    """Columns of one entity in the store, numeric ones as memory-mapped arrays."""
+
+    def __init__(self, path: Path, columns: Dict[str, Any]):
+        self.columns = {}
+        for column, dtype in columns.items():
+            if dtype == "str":
+                self.columns[column] = StringTable(path / column)
+            else:
+                self.columns[column] = np.load(path / f"{column}.npy", mmap_mode="r")
+
+    def __getitem__(self, column: str):
+        return self.columns[column]
+
+    def __len__(self) -> int:
+        return len(self.columns["id"])
+
+
+class AddressStore:
+    """
+    Memory-mapped columnar copy of the cities, streets and addresses tables.
+
+    Every uvicorn worker maps the same files, so the operating system page cache holds a single copy of the
+    data for all of them and nothing is copied into the Python heap. Addresses are sorted by street, each
+    street knowing where its addresses start, and streets reference their city by row index.
+    """
+
+    def __init__(self):
+        self.path: Optional[Path] = None
+        self.meta: Dict[str, Any] = {}
+        self.cities: Optional[Table] = None
+        self.streets: Optional[Table] = None
+        self.addresses: Optional[Table] = None
+        self.grid: Optional[GridIndex] = None
+        self.mtime = 0.0
+        self.checked_at = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self.addresses is not None
+
+    def open(self, path: Path) -> bool:
+        """Map a built store, returns False when there is none."""
+        if not (path / "meta.json").exists():
+            return False
+
+        self.path = path
+        self.mtime = (path / "meta.json").stat().st_mtime
+        self.checked_at = time.monotonic()
+        self.meta = json.loads((path / "meta.json").read_text())
+        self.cities = Table(path / "cities", CITY_COLUMNS)
+        self.streets = Table(path / "streets", STREET_COLUMNS)
+        self.addresses = Table(path / "addresses", ADDRESS_COLUMNS)
+        self.grid = GridIndex.open(path / "grid")
+        return True
+
+    def refresh(self, path: Path, interval: float) -> bool:
+        """
+        Map the store at `path` again when it was rebuilt since it was mapped, looking at most every
+        `interval` seconds. Returns whether it was, the arrays still referencing the old files keep them.
+        """
+        now = time.monotonic()
+        if now - self.checked_at < interval:
+            return False
+
+        self.checked_at = now
+        try:
+            mtime = (path / "meta.json").stat().st_mtime
+        except FileNotFoundError:
+            return False
+        return mtime != self.mtime and self.open(path)
+
+    def street_addresses(self, street: int) -> range:
+        """Row range of the addresses of a street."""
+        start = int(self.streets["address_start"][street])
+        end = int(self.streets["address_start"][street + 1]) if street + 1 < len(self.streets) else len(self.addresses)
+        return range(start, end)
+
+    def within(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float, limit: int) -> Tuple[int, List[int]]:
+        """
+        Find the addresses inside a bounding box.
+
+        Returns:
+            int: The number of addresses in the box.
+            list: The rows of the first `limit` of them, in store order.
+        """
+        rows = self.grid.bbox(min_lat, min_lon, max_lat, max_lon)
+        lats, lons = self.addresses["latitude"][rows], self.addresses["longitude"][rows]
+        rows = np.sort(rows[(lats >= min_lat) & (lats <= max_lat) & (lons >= min_lon) & (lons <= max_lon)])
+        return len(rows), rows[:limit].tolist()
+
+    def nearby(self, lat: float, lon: float, radius: float, limit: int) -> Tuple[int, List[Tuple[int, float]]]:
+        """
+        Find the addresses within `radius` meters of a point.
+
+        Returns:
+            int: The number of addresses within the radius.
+            list: The rows and distances of the `limit` nearest ones, nearest first.
+        """
+        rows = self.grid.bbox(*radius_bbox(lat, lon, radius))
+        distances = haversine(lat, lon, self.addresses["latitude"][rows], self.addresses["longitude"][rows])
+        inside = distances <= radius
+        rows, distances = rows[inside], distances[inside]
+        nearest = np.argsort(distances, kind="stable")[:limit]
+        return len(rows), [(int(rows[i]), float(distances[i])) for i in nearest]
+
+    def nearest(self, lat: float, lon: float, max_distance: float) -> Optional[Tuple[int, float]]:
+        """
+        Find the nearest address of a point, at most `max_distance` meters away.
+
+        The search radius starts at about one grid cell and doubles until an address is found: the nearest
+        address within a radius is the nearest one overall, so dense areas are answered from a few cells.
+        """
+        radius = min(self.grid.cell * METERS_PER_DEGREE, max_distance)
+        while True:
+            _, rows = self.nearby(lat, lon, radius, 1)
+            if rows:
+                return rows[0]
+            if radius >= max_distance:
+                return None
+            radius = min(radius * 2, max_distance)
+
+    def city(self, row: int) -> Dict[str, Any]:
+        return {
+            "id": int(self.cities["id"][row]),
+            "name": self.cities["name"][row],
+            "code_postal": self.cities["code_postal"][row],
+            "code_insee": self.cities["code_insee"][row],
+        }
+
+    def administrative_levels(self, row: int) -> Dict[str, Optional[Dict[str, str]]]:
+        """The administrative levels of a city, None where the city has none."""
+        levels = {}
+        for level in ("administrative_level_one", "administrative_level_two"):
+            code = self.cities[level][row]
+            levels[level] = {"code": code, "name": self.cities[f"{level}_name"][row]} if code else None
+        return levels
+
+    def address(self, row: int) -> Dict[str, Any]:
+        """Materialize an address row with its street and city."""
+        street = int(self.addresses["street"][row])
+        return {
+            "id": int(self.addresses["id"][row]),
+            "number": self.addresses["number"][row],
+            "number_extension": self.addresses["number_extension"][row],
+            "latitude": float(self.addresses["latitude"][row]),
+            "longitude": float(self.addresses["longitude"][row]),
+            "street": {"id": int(self.streets["id"][street]), "name": self.streets["name"][street]},
+            "city": self.city(int(self.streets["city"][street])),
+        }
+
+
+async def _count(connection, table: str) -> int:
+    return await connection.fetchval(f"SELECT count(*) FROM {table}")
+
+
+async def _write_table(connection, path: Path, columns: Dict[str, Any], query: str, length: int, transform=None, chunksize: int = 100_000):
+    """Stream a query into the columns of a table, one chunk of rows at a time."""
+    path.mkdir(parents=True, exist_ok=True)
+    writers = {column: StringTableWriter(path / column, length) if dtype == "str" else ColumnWriter(path / column, dtype, length) for column, dtype in columns.items()}
+
+    position = 0
+    cursor = await connection.cursor(query)
+    while position < length:
+        records = await cursor.fetch(chunksize)
+        if not records:
+            break
+
+        chunk = {column: [record[column] for record in records] for column in records[0].keys()}
+        if transform is not None:
+            chunk = transform(chunk)
+
+        for column, writer in writers.items():
+            writer.extend(chunk[column])
+        position += len(records)
+
+    for writer in writers.values():
+        writer.close()
+
+    return position
+
+
+async def build_address_store(
+    path: Path,
+    cell: float,
+    indexes: Sequence[Callable[[AddressStore], None]] = (),
+    chunksize: int = 100_000,
+) -> Dict[str, Any]:
+    """
+    Write the cities, streets and addresses tables into a columnar store at `path`, with a grid index of
+    `cell` degrees over the address coordinates.
+
+    Each of `indexes` is then called with the new store mapped, to write the indexes built from it (the
+    geocoder postings) next to its tables, so that they are swapped in together.
+
+    The store is written next to the previous one and swapped in with a rename: workers which mapped the
+    old files keep reading them until they reopen the store.
+    """
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+
+    client = Tortoise.get_connection("default")
+    async with client.acquire_connection() as connection:
+        async with connection.transaction(isolation="repeatable_read", readonly=True):
+            counts = {table: await _count(connection, table) for table in ("city", "street")}
+
+            await _write_table(
+                connection,
+                tmp_path / "cities",
+                CITY_COLUMNS,
+                "SELECT c.id, c.name, c.code_postal, c.code_insee, "
+                "c.administrative_level_one_id AS administrative_level_one, one.name AS administrative_level_one_name, "
+                "c.administrative_level_two_id AS administrative_level_two, two.name AS administrative_level_two_name "
+                "FROM city c "
+                "LEFT JOIN administrativelevelone one ON one.code = c.administrative_level_one_id "
+                "LEFT JOIN administrativeleveltwo two ON two.code = c.administrative_level_two_id "
+                "ORDER BY c.id",
+                counts["city"],
+                chunksize=chunksize,
+            )
+            city_ids = np.load(tmp_path / "cities" / "id.npy", mmap_mode="r")
+
+            def map_streets(chunk: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+                chunk["city"] = np.searchsorted(city_ids, np.asarray(chunk.pop("city_id"), dtype=np.int64))
+                return chunk
+
+            street_columns = {column: dtype for column, dtype in STREET_COLUMNS.items() if column != "address_start"}
+            await _write_table(
+                connection,
+                tmp_path / "streets",
+                street_columns,
+                "SELECT id, city_id, name FROM street ORDER BY id",
+                counts["street"],
+                transform=map_streets,
+                chunksize=chunksize,
+            )
+            street_ids = np.load(tmp_path / "streets" / "id.npy", mmap_mode="r")
+
+            def map_addresses(chunk: Dict[str, List[Any]]) -> Dict[str, List[Any]]:
+                chunk["street"] = np.searchsorted(street_ids, np.asarray(chunk.pop("street_id"), dtype=np.int64))
+                chunk["latitude"] = [np.nan if value is None else value for value in chunk["latitude"]]
+                chunk["longitude"] = [np.nan if value is None else value for value in chunk["longitude"]]
+                return chunk
+
+            # Addresses without street are left out: they cannot be reached from the street index.
+            counts["address"] = await connection.fetchval("SELECT count(*) FROM address WHERE street_id IS NOT NULL")
+            await _write_table(
+                connection,
+                tmp_path / "addresses",
+                ADDRESS_COLUMNS,
+                "SELECT id, street_id, number, number_extension, latitude, longitude FROM address WHERE street_id IS NOT NULL ORDER BY street_id, id",
+                counts["address"],
+                transform=map_addresses,
+                chunksize=chunksize,
+            )
+
+    # Addresses are sorted by street, the first row of each street is a binary search away.
+    address_streets = np.load(tmp_path / "addresses" / "street.npy", mmap_mode="r")
+    address_start = np.lib.format.open_memmap(tmp_path / "streets" / "address_start.npy", mode="w+", dtype=np.int64, shape=(counts["street"],))
+    address_start[:] = np.searchsorted(address_streets, np.arange(counts["street"]), side="left")
+    address_start.flush()
+
+    addresses = Table(tmp_path / "addresses", ADDRESS_COLUMNS)
+    GridIndex.build(np.asarray(addresses["latitude"]), np.asarray(addresses["longitude"]), cell).save(tmp_path / "grid")
+
+    meta = {"built_at": time.time(), "cities": counts["city"], "streets": counts["street"], "addresses": counts["address"]}
+    (tmp_path / "meta.json").write_text(json.dumps(meta))
+
+    store = AddressStore()
+    store.open(tmp_path)
+    for build_index in indexes:
+        build_index(store)
+    del store
+
+    old_path = path.with_name(f"{path.name}.old")
+    shutil.rmtree(old_path, ignore_errors=True)
+    if path.exists():
+        path.rename(old_path)
+    tmp_path.rename(path)
+    shutil.rmtree(old_path, ignore_errors=True)
+
+    return meta
+
+
+address_store = AddressStore()
@@ -0,0 +1,18 @@
+import re
+import unicodedata
+
+_whitespace = re.compile(r"\s+")
+
+
+def fold_accents(value: str) -> str:
+    """Strip the diacritics of a string, "Léon" -> "Leon"."""
+    return "".join(char for char in unicodedata.normalize("NFKD", value) if not unicodedata.combining(char))
+
+
+def normalize_text(value: str) -> str:
+    """
+    Fold a free text for comparisons and keys: accents, case and whitespace.
+
+    "  12 Rue  de l'Église " -> "12 rue de l'eglise"
+    """
+    return _whitespace.sub(" ", fold_accents(value).casefold()).strip()
@@ -0,0 +1,170 @@
+import asyncio
+import hashlib
+import json
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Settings
+from models.geo import GeoData
+from utils.cache import aget_from_cache, aincr_in_cache, aset_in_cache
+from utils.regions import LINKED_ENTITIES, RegionIndex
+from utils.singleflight import SingleFlight
+
+settings = Settings()
+
+TILES_VERSION_KEY = "tiles:version"
+EXTENT = 4096
+BUFFER = 64
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Bounding box (min_lon, min_lat, max_lon, max_lat) of a web mercator tile."""
+    n = 2**z
+
+    def lat(row: int) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def project(ring: np.ndarray, z: int, x: int, y: int) -> np.ndarray:
+    """Project lon, lat coordinates into the pixel space of a tile, 0 to EXTENT along each axis."""
+    n = 2**z
+    lat = np.radians(np.clip(ring[:, 1], -85.0511, 85.0511))
+    mx = (ring[:, 0] + 180) / 360
+    my = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / math.pi) / 2
+    return np.column_stack(((mx * n - x) * EXTENT, (my * n - y) * EXTENT))
+
+
+def clip_ring(ring: np.ndarray, low: float, high: float) -> np.ndarray:
+    """Sutherland-Hodgman clipping of a closed ring to the square [low, high] on both axes."""
+    points = ring[:-1] if len(ring) > 1 and (ring[0] == ring[-1]).all() else ring
+    for axis, bound, keep_below in ((0, low, False), (0, high, True), (1, low, False), (1, high, True)):
+        if not len(points):
+            break
+
+        inside = points[:, axis] <= bound if keep_below else points[:, axis] >= bound
+        if inside.all():
+            continue
+
+        clipped = []
+        previous, previous_inside = points[-1], inside[-1]
+        for point, point_inside in zip(points, inside):
+            if point_inside != previous_inside:
+                t = (bound - previous[axis]) / (point[axis] - previous[axis])
+                clipped.append(previous + t * (point - previous))
+            if point_inside:
+                clipped.append(point)
+            previous, previous_inside = point, point_inside
+
+        points = np.asarray(clipped).reshape(-1, 2)
+
+    return points
+
+
+def quantize(ring: np.ndarray) -> Optional[List[List[int]]]:
+    """Round a clipped ring to integer pixels, dropping repeated points, None when it degenerates."""
+    pixels = np.rint(ring).astype(np.int64)
+    if len(pixels):
+        pixels = pixels[np.any(pixels != np.roll(pixels, 1, axis=0), axis=1)]
+    if len(pixels) < 3:
+        return None
+    return pixels.tolist() + [pixels[0].tolist()]
+
+
+def render_tile(index: RegionIndex, z: int, x: int, y: int) -> Dict[str, Any]:
+    """Clip and quantize the geometries crossing a tile into a FeatureCollection in tile pixels."""
+    margin = BUFFER / EXTENT
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(z, x, y)
+    dlon, dlat = (max_lon - min_lon) * margin, (max_lat - min_lat) * margin
+    box = (min_lon - dlon, min_lat - dlat, max_lon + dlon, max_lat + dlat)
+
+    features = []
+    for i in index.tree.query_box(box).tolist():
+        polygons = []
+        for polygon in index.polygons[i]:
+            rings = [quantize(clip_ring(project(ring, z, x, y), -BUFFER, EXTENT + BUFFER)) for ring in polygon]
+            if rings[0] is not None:
+                polygons.append([ring for ring in rings if ring is not None])
+
+        if polygons:
+            entry = index.entries[i]
+            features.append(
+                {
+                    "type": "Feature",
+                    "id": entry["id"],
+                    "properties": {"linked_entity_type": entry["linked_entity_type"], "linked_entity_id": entry["linked_entity_id"]},
+                    "geometry": {"type": "MultiPolygon", "coordinates": polygons},
+                }
+            )
+
+    return {"type": "FeatureCollection", "extent": EXTENT, "features": features}
+
+
+def resolution_for_zoom(z: int) -> str:
+    if z >= settings.tiles_full_min_zoom:
+        return "full"
+    if z >= settings.tiles_medium_min_zoom:
+        return "medium"
+    return "low"
+
+
+def etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+async def bump_tiles_version():
+    """Retire every cached tile, called after the GeoData geometries change."""
+    await aincr_in_cache(TILES_VERSION_KEY)
+
+
+class TileSource:
+    """
+    Boundary tiles rendered from GeoData and cached in valkey.
+
+    The geometries of a resolution are parsed and indexed on the first tile that needs them. Cached tiles
+    are keyed by the tiles version, so bumping it after a load retires them all and the indexes are
+    rebuilt from the new geometries.
+    """
+
+    def __init__(self):
+        self.indexes: Dict[str, RegionIndex] = {}
+        self.version: Optional[int] = None
+        self._flight = SingleFlight()
+
+    async def _index(self, resolution: str) -> RegionIndex:
+        index = self.indexes.get(resolution)
+        if index is None:
+            column = GeoData.RESOLUTIONS[resolution]
+            rows = await GeoData.all().values("id", *(f"{entity}_id" for entity in LINKED_ENTITIES), geojson=column)
+            rows = await GeoData.fill_missing_resolution(rows, column, key="geojson")
+            index = RegionIndex()
+            await asyncio.to_thread(index.build, rows)
+            self.indexes[resolution] = index
+
+        return index
+
+    async def _render(self, key: str, z: int, x: int, y: int) -> bytes:
+        index = await self._flight.do(f"index:{self.version}:{resolution_for_zoom(z)}", lambda: self._index(resolution_for_zoom(z)))
+        body = json.dumps(await asyncio.to_thread(render_tile, index, z, x, y), separators=(",", ":"))
+        await aset_in_cache(key, body, settings.tiles_cache_ttl)
+        return body.encode("utf-8")
+
+    async def tile(self, z: int, x: int, y: int) -> bytes:
+        """The GeoJSON body of a tile, from the cache or freshly rendered."""
+        version = await aget_from_cache(TILES_VERSION_KEY)
+        version = int(version) if version is not None else 0
+        if version != self.version:
+            self.indexes, self.version = {}, version
+
+        key = f"tiles:v1:{version}:{z}:{x}:{y}"
+        cached = await aget_from_cache(key)
+        if cached is not None:
+            return cached
+
+        return await self._flight.do(key, lambda: self._render(key, z, x, y))
+
+
+tile_source = TileSource()